@@ -1,19 +1,219 @@
+import time
+STARTED = time.perf_counter()  # Taken before pygame is imported, for --startup-stats
 import pygame
 import random
 import math
 import sys
 import json
 import os
+import argparse
+import atexit
+import gc
+import threading
+import queue
+import sqlite3
+from collections import OrderedDict
+from replay import MAX_SHOTS, encode_tick, decode_tick, read_replay, write_replay
+from physics import (WIDTH, HEIGHT, GRAVITY_CONSTANT, PLANET_RADIUS_SCALE, TIME_SCALE, BARNES_HUT_MIN_BODIES,
+                     INTEGRATORS, step_planets_python, step_planets_numpy, merge_planets, QuadTree,
+                     SpatialHash, swept_contact, swept_circle)
+try:
+    import numpy as np  # Optional, only needed for the numpy physics backend
+except ImportError:
+    np = None
 SETTINGS_FILE = "settings.json"
 default_settings = {
     "player_name": None,
     "music_volume": 0.5,
     "sfx_volume": 0.5,
-    "max_score": 0
+    "max_score": 0,
+    "scores": {},  # Recent scores per player name
+    "render_scale": 1.0
 }
-settings = None
+SETTINGS_DEBOUNCE = 0.5  # Seconds without changes before settings are written
+SCORE_HISTORY = 50  # Scores kept per player name
+
+class SettingsStore:
+    # settings.json, with any missing keys filled in from default_settings. Changes are written
+    # by a background thread once nothing has changed for SETTINGS_DEBOUNCE seconds, so dragging a
+    # slider or dying never waits on the disk. Writes go to a temporary file that then replaces
+    # settings.json, a crash mid-write leaves the old file intact
+    def __init__(self, path=SETTINGS_FILE):
+        self.path = path
+        self.data = self.defaults()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.version = 0  # Bumped on every change
+        self.written = 0  # Version that is on disk
+        self.due = None
+        self.thread = None
+
+    @staticmethod
+    def defaults():
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in default_settings.items()}
+
+    def load(self):
+        # Returns False when there is no settings file yet. A file that can't be read or doesn't
+        # hold a JSON object gives the defaults, and scores that aren't lists per name are dropped
+        data = self.defaults()
+        try:
+            with open(self.path, "r") as f:
+                loaded = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as error:
+            print(f"Could not read {self.path} ({error}), using the default settings")
+            loaded = {}
+        if not isinstance(loaded, dict):
+            print(f"{self.path} does not hold a JSON object, using the default settings")
+            loaded = {}
+        scores = loaded.get("scores", {})
+        if not isinstance(scores, dict) or not all(isinstance(history, list) for history in scores.values()):
+            print(f"Could not read the scores in {self.path}, starting a new score history")
+            loaded["scores"] = {}
+        data.update(loaded)
+        with self.lock:
+            self.data = data
+        return True
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def update(self, **changes):
+        with self.lock:
+            changed = {key: value for key, value in changes.items() if self.data.get(key) != value}
+            if not changed:
+                return
+            self.data.update(changed)
+        self.save()
+
+    def record_score(self, points):
+        with self.lock:
+            name = self.data["player_name"] or "player"
+            history = self.data["scores"].setdefault(name, [])
+            history.append({"points": points, "time": round(time.time())})
+            del history[:-SCORE_HISTORY]
+            self.data["max_score"] = max(self.data["max_score"], points)
+        self.save()
+
+    def save(self):
+        # Write soon on the background thread, later changes push the write back
+        with self.lock:
+            self.version += 1
+            self.due = time.monotonic() + SETTINGS_DEBOUNCE
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.write_when_quiet, daemon=True)
+                self.thread.start()
+
+    def write_when_quiet(self):
+        while True:
+            with self.lock:
+                wait = self.due - time.monotonic()
+                if wait <= 0:
+                    self.thread = None
+                    text, version = json.dumps(self.data, indent=4), self.version
+                    break
+            time.sleep(wait)
+        self.write(text, version)
+
+    def flush(self):
+        # Write any pending change right now, used on exit
+        with self.lock:
+            text, version = json.dumps(self.data, indent=4), self.version
+        self.write(text, version)
+
+    def write(self, text, version):
+        with self.write_lock:
+            if version <= self.written:
+                return  # A newer version is already on disk
+            temporary = self.path + ".tmp"
+            with open(temporary, "w") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, self.path)
+            self.written = version
+
+settings = SettingsStore()
+
+LEADERBOARD_FILE = "leaderboard.db"
+
+class Leaderboard:
+    # Every finished run in a SQLite database. Runs are indexed by score for the top list and by
+    # player for personal bests, recent runs come straight from the row ids. A trigger keeps a
+    # count of runs per score, so a rank sums a few hundred distinct scores instead of counting
+    # every run above it
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            cause TEXT NOT NULL,
+            duration REAL NOT NULL,
+            shots INTEGER NOT NULL,
+            splits INTEGER NOT NULL,
+            time INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS runs_by_points ON runs (points DESC);
+        CREATE INDEX IF NOT EXISTS runs_by_player ON runs (name, points DESC);
+        CREATE TABLE IF NOT EXISTS score_counts (points INTEGER PRIMARY KEY, runs INTEGER NOT NULL);
+        CREATE TRIGGER IF NOT EXISTS count_score AFTER INSERT ON runs BEGIN
+            INSERT INTO score_counts VALUES (new.points, 1)
+                ON CONFLICT (points) DO UPDATE SET runs = runs + 1;
+        END;
+    """
+
+    def __init__(self, path=LEADERBOARD_FILE):
+        self.path = path
+        self.connection = None  # Opened on first use
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode=WAL")  # One small append per run instead of a journal rewrite
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(self.SCHEMA)
+        return self.connection
+
+    def record(self, name, points, cause, duration, shots, splits):
+        with self.connect() as connection:
+            connection.execute("INSERT INTO runs (name, points, cause, duration, shots, splits, time) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (name, points, cause, duration, shots, splits, round(time.time())))
+
+    def record_many(self, runs):
+        # (name, points, cause, duration, shots, splits, time) tuples in one transaction
+        with self.connect() as connection:
+            connection.executemany("INSERT INTO runs (name, points, cause, duration, shots, splits, time) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?)", runs)
+
+    def rank(self, points):
+        # 1 + runs with a higher score, and the number of runs
+        above, total = self.connect().execute(
+            "SELECT COALESCE(SUM(CASE WHEN points > ? THEN runs END), 0), COALESCE(SUM(runs), 0) "
+            "FROM score_counts", (points,)).fetchone()
+        return above + 1, total
+
+    def top(self, count=10):
+        return self.connect().execute("SELECT name, points FROM runs ORDER BY points DESC LIMIT ?",
+                                      (count,)).fetchall()
+
+    def best(self, name):
+        row = self.connect().execute("SELECT MAX(points) FROM runs WHERE name = ?", (name,)).fetchone()
+        return row[0]
+
+    def recent(self, count=10):
+        return self.connect().execute("SELECT name, points, cause, duration FROM runs ORDER BY id DESC LIMIT ?",
+                                      (count,)).fetchall()
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+leaderboard = Leaderboard()
+
 def prompt_player_name(screen):
-    font = pygame.font.SysFont(None, 36)
     input_box = pygame.Rect(200, 250, 400, 40)
     color_inactive = pygame.Color('lightskyblue3')
     color_active = pygame.Color('dodgerblue2')
@@ -40,101 +240,331 @@ def prompt_player_name(screen):
                             name += event.unicode
 
         # Draw prompt
-        prompt = font.render("Enter your name and press Enter:", True, (255, 255, 255))
+        prompt = text_renderer.render("Enter your name and press Enter:", (255, 255, 255), 36, system=True)
         screen.blit(prompt, (200, 200))
 
         # Draw input box
-        txt_surface = font.render(name, True, color)
+        txt_surface = text_renderer.render(name, color, 36, system=True)
         pygame.draw.rect(screen, color, input_box, 2)
         screen.blit(txt_surface, (input_box.x + 5, input_box.y + 5))
 
         pygame.display.flip()
     return name
         
-def save_settings(settings):
-    # Compare and keep the higher max_score
-    if player.points > settings.get("max_score"):
-        settings["max_score"] = player.points
-    settings["music_volume"] = music_slider.get_value()
-    settings["sfx_volume"] = sfx_slider.get_value()
-
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=4)
-
 def load_settings(screen):
-    global settings
-    if not os.path.exists(SETTINGS_FILE):
-        settings = default_settings.copy()
-        settings["player_name"] = prompt_player_name(screen)
-        save_settings(settings)
-        return settings
-    else:
-        with open(SETTINGS_FILE, "r") as f:
-            return json.load(f)
+    # Ask for a name the first time the game is played
+    if not settings.load() or not settings["player_name"]:
+        settings.update(player_name=prompt_player_name(screen))
+    return settings
 
 
-WIDTH, HEIGHT = 1536, 864
-GRAVITY_CONSTANT = 10
-PLANET_RADIUS_SCALE = 1.5
 MAX_PLANETS = 8
+BARNES_HUT_THETA = 0.5  # Opening angle, bigger is faster but less accurate
+GLOW_RADIUS_STEP = 2  # Glow radii are rounded to this many pixels so planets can share textures
+GLOW_COLOR_STEP = 8  # Colour channels are rounded to this step for the same reason
+GLOW_CACHE_BYTES = 32 * 1024 * 1024
+SPRITE_CACHE_BYTES = 32 * 1024 * 1024
 TICK_RATE = 60
-TIME_SCALE = 0.5  
 
 BULLET_SPEED = 8  
 MAX_PLAYER_SPEED = 4
 MAX_BULLETS = 50
+BROAD_PHASE_MIN_PAIRS = 512  # Planet x (bullet + player) pairs before the collision grid pays off
+MAX_SUBSTEPS = 5  # Physics ticks per rendered frame before the simulation gives up catching up
 POINTS_PREV = None
 
-GRADIENT_CACHED = None
+# Command line options
+parser = argparse.ArgumentParser(description="Gravitroids")
+parser.add_argument("--physics", choices=["python", "numpy", "barnes-hut"], default="python",
+                    help="backend for the planet-planet gravity and merge loop")
+parser.add_argument("--theta", type=float, default=BARNES_HUT_THETA,
+                    help="Barnes-Hut opening angle")
+parser.add_argument("--integrator", choices=["euler", "leapfrog", "adaptive"], default="euler",
+                    help="how the player, the planets and the trajectory preview are moved under gravity")
+parser.add_argument("--max-planets", type=int, default=MAX_PLANETS,
+                    help="maximum number of planets spawned at random")
+parser.add_argument("--physics-rate", type=int, default=TICK_RATE,
+                    help="physics ticks per second, the game runs at the same speed at any rate")
+parser.add_argument("--fps", type=int, default=0,
+                    help="frame rate cap for rendering, 0 renders as fast as possible")
+parser.add_argument("--headless", action="store_true",
+                    help="run the simulation without window, audio or frame limit and report ticks per second")
+parser.add_argument("--ticks", type=int, default=TICK_RATE * 60 * 10,
+                    help="number of ticks to simulate in headless mode")
+parser.add_argument("--seed", type=int, default=None,
+                    help="random seed, headless mode defaults to 0 and the game to a random one")
+parser.add_argument("--script", default=None,
+                    help="input script for headless mode, see InputScript")
+parser.add_argument("--record", default=None,
+                    help="record the session to a replay file")
+parser.add_argument("--replay", default=None,
+                    help="play back a replay file, with --headless it is re-simulated as fast as possible")
+parser.add_argument("--seek", type=int, default=0,
+                    help="tick to start a replay from")
+parser.add_argument("--collisions", choices=["discrete", "swept"], default="swept",
+                    help="test collisions at the end of each tick only, or along the whole movement so nothing tunnels")
+parser.add_argument("--render-scale", type=float, default=None, metavar="SCALE",
+                    help="draw the game world at SCALE times the window size (0.25 to 1) and scale it up, "
+                         "defaults to render_scale in settings.json")
+parser.add_argument("--renderer", choices=["flip", "dirty"], default="flip",
+                    help="flip redraws the whole screen every frame, dirty only redraws and updates what changed")
+parser.add_argument("--pipeline", action="store_true",
+                    help="run the simulation on its own thread, the window draws the latest tick it published")
+parser.add_argument("--profile", action="store_true",
+                    help="start with the frame profiler overlay shown (F3 toggles it)")
+parser.add_argument("--profile-log", metavar="FILE",
+                    help="write the frame profiler's per-frame stage times to FILE, CSV for .csv and JSON lines otherwise")
+parser.add_argument("--gc-stats", action="store_true",
+                    help="print garbage collector pauses and planet pool reuse on exit")
+parser.add_argument("--glow-stats", action="store_true",
+                    help="print glow texture cache hit/miss counters on exit")
+parser.add_argument("--startup-stats", action="store_true",
+                    help="print how long it took from starting Python to the first frame")
+parser.add_argument("--leaderboard", default=LEADERBOARD_FILE, metavar="FILE",
+                    help="SQLite database that every finished run is recorded in")
+
+def configure(args):
+    # Module settings from parsed options. Importing the module uses the defaults, main() parses
+    # the real command line
+    global ARGS, MAX_PLANETS, PHYSICS_DT, FPS_LIMIT, BARNES_HUT_THETA, PHYSICS_BACKEND, COLLISIONS, HEADLESS
+    global INTEGRATOR, PREDICTION_STEPS, PREDICTION_DT, TICK_SCALE
+    ARGS = args
+    MAX_PLANETS = ARGS.max_planets
+    PHYSICS_DT = 1 / ARGS.physics_rate
+    # Speeds, thrust and forces are per 1/TICK_RATE s, every physics tick moves the game on by
+    # TICK_SCALE of those so the rate doesn't change the game speed
+    TICK_SCALE = TICK_RATE / ARGS.physics_rate
+    FPS_LIMIT = ARGS.fps
+    BARNES_HUT_THETA = ARGS.theta
+    PHYSICS_BACKEND = ARGS.physics
+    COLLISIONS = ARGS.collisions
+    INTEGRATOR = ARGS.integrator
+    # The same 30 ticks ahead either way, leapfrog is accurate enough with half the steps
+    PREDICTION_STEPS, PREDICTION_DT = (60, 0.5) if INTEGRATOR == "euler" else (30, 1.0)
+    if PHYSICS_BACKEND != "python" and np is None:
+        print("NumPy is not installed, falling back to the python physics backend")
+        PHYSICS_BACKEND = "python"
+    HEADLESS = ARGS.headless
+    leaderboard.close()
+    leaderboard.path = ARGS.leaderboard
+
+configure(parser.parse_args([]))
+
+BACKGROUND_COLOR = None  # Background colour for the current score
+TITLE_BACKGROUND = None
+
+# Every random decision of the simulation goes through this generator, so a seed and the
+# player's input are enough to replay a session
+game_rng = random.Random()
 
 # Colors
 BLACK = (0, 0, 0)
 TRANSLUCENT_WHITE = (255, 255, 255, 128) 
 TEXT_COLOR = (255, 255, 255)
 
-# Initialize Pygame
-pygame.init()
-pygame.mixer.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Gravitroids")
+# Nothing is opened on import: init_display() creates the window and the mixer.
+# The simulation works in WIDTH x HEIGHT coordinates and the window is that size. The world
+# (background, planets, preview, player and bullets) is drawn into world_surface at RENDER_SCALE
+# times that and scaled to the window in one go, text and menus are drawn on the window itself
+screen = None
+world_surface = None
+RENDER_SCALE = 1.0
+AUDIO = False
 clock = pygame.time.Clock()
+startup_times = {}
+
+def init_display():
+    global screen, world_surface, RENDER_SCALE, AUDIO, channel_a, channel_b, current_channel
+    if ARGS.render_scale is None:
+        settings.load()
+        RENDER_SCALE = settings["render_scale"]
+    else:
+        RENDER_SCALE = ARGS.render_scale
+    RENDER_SCALE = max(0.25, min(1.0, RENDER_SCALE))
+    if HEADLESS:
+        # No need for a real window or sound card
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        screen = pygame.Surface((WIDTH, HEIGHT))  # Never shown, drawing code still has a target
+        world_surface = screen
+        return
+    pygame.init()
+    pygame.mixer.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    if RENDER_SCALE == 1:
+        world_surface = screen
+    else:
+        world_surface = pygame.Surface((round(WIDTH * RENDER_SCALE), round(HEIGHT * RENDER_SCALE))).convert()
+    pygame.display.set_caption("Gravitroids")
+    AUDIO = True
+    pygame.mixer.music.set_volume(music_slider.get_value())
+    # Two channels for alternating playback
+    channel_a = pygame.mixer.Channel(0)
+    channel_b = pygame.mixer.Channel(1)
+    current_channel = channel_a
+
+def startup_mark(stage):
+    # Time since Python started loading the module, printed with --startup-stats at the first frame
+    if stage in startup_times:
+        return
+    startup_times[stage] = time.perf_counter() - STARTED
+    if stage == "first frame" and ARGS.startup_stats:
+        print("Startup: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in startup_times.items()))
         
 def predict_trajectory(player, planets, steps=60, dt=0.5):
-    pos = pygame.Vector2(player.x, player.y)
-    vel = pygame.Vector2(player.vx, player.vy)
-    trajectory_points = [pos.xy]
-
-    for _ in range(steps):
-        total_acc = pygame.Vector2(0, 0)
-        for planet in planets:
-            direction = pygame.Vector2(planet.x, planet.y) - pos
-            distance = direction.length()
-            if distance < planet.radius:
-                # Stop prediction on collision
-                return trajectory_points, True
-            if distance > 0:
-                force_mag = GRAVITY_CONSTANT * planet.mass / (distance ** 2)
-                acc = direction.normalize() * force_mag
-                total_acc += acc
-
-        # Update velocity and position
-        vel += total_acc * dt
-        pos += vel * dt
-        trajectory_points.append(pos.xy)
-
-    return trajectory_points, False
-
+    return TrajectoryPredictor(steps, dt).predict(player, planets)
+
+class TrajectoryPredictor:
+    # Predicts the player's path against the current planets (which are treated as fixed).
+    # The last prediction is kept. Frames drawn before the next physics tick get it back as it is,
+    # and when the player is still on it one tick later the path is shifted by one tick and only
+    # the tail is integrated. Thrust, planets spawning, splitting or merging, or planets drifting
+    # more than drift_tolerance pixels force a full re-integration. Planets move up to about a
+    # pixel per tick, so the default lets a path be shifted for roughly 8 to 30 ticks, while the
+    # shifted path stays within about a pixel of a full re-integration.
+    # The prediction stops at the first point inside a planet, like before
+    def __init__(self, steps=60, dt=0.5, drift_tolerance=8.0, anchor_tolerance=0.5, velocity_tolerance=0.02):
+        self.steps = steps
+        self.dt = dt
+        # Prediction steps per physics tick, 0 when a tick isn't a whole number of steps and the
+        # path can't be reused
+        shift = TICK_SCALE / dt
+        self.shift = round(shift) if abs(shift - round(shift)) < 1e-9 else 0
+        self.drift_tolerance = drift_tolerance
+        self.anchor_tolerance = anchor_tolerance
+        self.velocity_tolerance = velocity_tolerance  # Below one tick of thrust
+        self.points = []
+        self.velocities = []
+        self.hit = False
+        self.signature = None
+        self.player_state = None
+        self.planet_positions = None
+        self.anchor_positions = []
+        self.planet_state = []
+        self.planet_arrays = None
+        self.full_updates = 0
+        self.reused = 0
+
+    def load_planets(self, planets):
+        self.planet_state = [(planet.x, planet.y, planet.mass, planet.radius) for planet in planets]
+        if np is not None and len(planets) >= 16:
+            self.planet_arrays = np.array(self.planet_state, dtype=float).T
+        else:
+            self.planet_arrays = None
+
+    def acceleration(self, x, y):
+        # Acceleration from all planets at (x, y), None if the point is inside a planet
+        if self.planet_arrays is not None:
+            px, py, mass, radius = self.planet_arrays
+            dx = px - x
+            dy = py - y
+            dist = np.hypot(dx, dy)
+            if (dist < radius).any():
+                return None
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scale = np.where(dist > 0, GRAVITY_CONSTANT * mass / dist ** 3, 0.0)
+            return float(scale @ dx), float(scale @ dy)
+        acc_x, acc_y = 0.0, 0.0
+        for px, py, mass, radius in self.planet_state:
+            dx = px - x
+            dy = py - y
+            dist = math.sqrt(dx * dx + dy * dy)
+            if dist < radius:
+                return None
+            if dist > 0:
+                scale = GRAVITY_CONSTANT * mass / (dist * dist * dist)
+                acc_x += dx * scale
+                acc_y += dy * scale
+        return acc_x, acc_y
+
+    def integrate(self, count):
+        # Extend the path by count steps from its last point, returns True on a collision
+        x, y = self.points[-1]
+        vx, vy = self.velocities[-1]
+        dt = self.dt
+        step = INTEGRATORS[INTEGRATOR]
+        for _ in range(count):
+            state = step(x, y, vx, vy, dt, self.acceleration)
+            if state is None:
+                return True
+            x, y, vx, vy = state
+            self.points.append((x, y))
+            self.velocities.append((vx, vy))
+        return False
+
+    def on_path(self, player):
+        if self.shift == 0 or len(self.points) <= self.shift:
+            return False
+        x, y = self.points[self.shift]
+        vx, vy = self.velocities[self.shift]
+        return (abs(x - player.x) <= self.anchor_tolerance and abs(y - player.y) <= self.anchor_tolerance
+                and abs(vx - player.vx) <= self.velocity_tolerance
+                and abs(vy - player.vy) <= self.velocity_tolerance)
+
+    def drifted(self, planets):
+        tolerance = self.drift_tolerance ** 2
+        for planet, (x, y) in zip(planets, self.anchor_positions):
+            if (planet.x - x) ** 2 + (planet.y - y) ** 2 > tolerance:
+                return True
+        return False
+
+    def predict(self, player, planets):
+        signature = [(id(planet), planet.generation, planet.mass, planet.radius) for planet in planets]
+        player_state = (player.x, player.y, player.vx, player.vy)
+        planet_positions = [(planet.x, planet.y) for planet in planets]
+        if (signature == self.signature and player_state == self.player_state
+                and planet_positions == self.planet_positions):
+            return self.points, self.hit  # No tick since the last call, e.g. a second frame or the pause screen
+        self.player_state = player_state
+        self.planet_positions = planet_positions
+        self.load_planets(planets)
+        if signature == self.signature and not self.drifted(planets) and self.on_path(player):
+            del self.points[:self.shift]
+            del self.velocities[:self.shift]
+            if not self.hit:
+                self.hit = self.integrate(self.steps + 1 - len(self.points))
+            self.reused += 1
+        else:
+            self.signature = signature
+            self.anchor_positions = planet_positions
+            self.points = [(player.x, player.y)]
+            self.velocities = [(player.vx, player.vy)]
+            self.hit = self.integrate(self.steps)
+            self.full_updates += 1
+        return self.points, self.hit
+
+def glow_pixel_step(mass):
+    if mass <= 50:
+        resolution_factor = 1.0  # Full resolution for planets with mass ≤ 50
+    else:
+        resolution_factor = 1.0 / (1 + (mass - 50) / 100)  # Slower decay
+    return max(1, int(1 / resolution_factor))  # The higher the factor, the fewer the pixels to render
 
 def create_glow_texture(radius, color, mass):
     glow_radius = int(radius * 0.5)  # Glow radius scaled down
+    return build_glow_texture(glow_radius, color, glow_pixel_step(mass))
+
+def build_glow_texture(glow_radius, color, step):
     glow_radius_squared = glow_radius * glow_radius  # Precompute squared radius
     glow_texture = pygame.Surface((glow_radius * 2, glow_radius * 2), pygame.SRCALPHA)
-
-    if mass <= 50:
-        resolution_factor = 1.0  # Full resolution for planets with mass ≤ 50
-    else:
-        resolution_factor = 1.0 / (1 + (mass - 50) / 100)  # Slower decay
-    step = max(1, int(1 / resolution_factor))  # The higher the factor, the fewer the pixels to render
+    if glow_radius == 0:
+        return glow_texture
+
+    if np is not None:
+        # Same pixels as the loop below, filled as whole arrays through surfarray
+        offsets = np.arange(-glow_radius, glow_radius, step)
+        dist_squared = offsets[:, None] ** 2 + offsets[None, :] ** 2
+        inside = dist_squared < glow_radius_squared
+        intensity = np.maximum(0, 255 - (dist_squared / glow_radius_squared) * 255)
+        index = offsets + glow_radius
+        pixels = pygame.surfarray.pixels3d(glow_texture)
+        alpha = pygame.surfarray.pixels_alpha(glow_texture)
+        for channel in range(3):
+            values = np.minimum((color[channel] + intensity).astype(int), 255)
+            pixels[index[:, None], index[None, :], channel] = np.where(inside, values, 0)
+        alpha[index[:, None], index[None, :]] = np.where(inside, intensity.astype(int), 0)
+        del pixels, alpha  # Unlock the surface
+        return glow_texture
 
     for x in range(-glow_radius, glow_radius, step):
         for y in range(-glow_radius, glow_radius, step):
@@ -151,6 +581,117 @@ def create_glow_texture(radius, color, mass):
 
     return glow_texture
 
+class GlowCache:
+    # Shared glow textures keyed by quantized glow radius, colour and pixel step (the mass tier).
+    # Least recently used textures are dropped once the cache goes over max_bytes
+    def __init__(self, max_bytes=GLOW_CACHE_BYTES, radius_step=GLOW_RADIUS_STEP, color_step=GLOW_COLOR_STEP):
+        self.max_bytes = max_bytes
+        self.radius_step = radius_step
+        self.color_step = color_step
+        self.textures = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, radius, color, mass):
+        glow_radius = int(radius * 0.5)
+        glow_radius = max(0, round(glow_radius / self.radius_step) * self.radius_step)
+        color = tuple(min(255, round(c / self.color_step) * self.color_step) for c in color)
+        return glow_radius, color, glow_pixel_step(mass)
+
+    def get(self, radius, color, mass):
+        key = self.key(radius, color, mass)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return texture
+        self.misses += 1
+        texture = build_glow_texture(*key)
+        self.textures[key] = texture
+        self.bytes += texture.get_width() * texture.get_height() * 4
+        while self.bytes > self.max_bytes and len(self.textures) > 1:
+            _, old = self.textures.popitem(last=False)
+            self.bytes -= old.get_width() * old.get_height() * 4
+            self.evictions += 1
+        return texture
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "textures": len(self.textures),
+            "bytes": self.bytes,
+        }
+
+glow_cache = GlowCache()
+
+class SpriteCache:
+    # Pre-rendered sprites for DrawList: a planet's glow with its disc already drawn on top, the
+    # player's ship and its hollow ghost rounded to whole degrees (a turn is 3 * TICK_SCALE
+    # degrees, which is fractional at most physics rates) and the bullet. Planets with the same glow texture, colour and radius share a sprite. Least
+    # recently used sprites are dropped once the cache goes over max_bytes. They are separate
+    # surfaces rather than regions of one packed atlas, SDL's software blitter gains nothing
+    # from a shared source surface
+    def __init__(self, max_bytes=SPRITE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.sprites = OrderedDict()
+        self.bytes = 0
+
+    def add(self, key, sprite):
+        self.sprites[key] = sprite
+        self.bytes += sprite.get_width() * sprite.get_height() * 4
+        while self.bytes > self.max_bytes and len(self.sprites) > 1:
+            _, old = self.sprites.popitem(last=False)
+            self.bytes -= old.get_width() * old.get_height() * 4
+        return sprite
+
+    def planet(self, glow_texture, color, radius):
+        key = (glow_texture, color, radius)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        radius = int(radius * RENDER_SCALE)
+        size = max(glow_texture.get_width(), radius * 2 + 1)
+        center = size // 2
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        # Copied rather than blended, blending into the transparent sprite would darken the glow
+        sprite.blit(glow_texture, glow_texture.get_rect(center=(center, center)), special_flags=pygame.BLEND_RGBA_MAX)
+        pygame.draw.circle(sprite, color, (center, center), radius)
+        return self.add(key, sprite)
+
+    def ship(self, angle, color, width=0):
+        angle = round(angle) % 360  # At most 360 sprites per ship, the half degree doesn't show
+        key = ("ship", angle, color, width)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        center = math.ceil(20 * RENDER_SCALE) + 1
+        sprite = pygame.Surface((center * 2 + 1, center * 2 + 1))
+        sprite.set_colorkey((0, 0, 0))
+        draw_ship(sprite, center, center, angle, color, width)
+        return self.add(key, sprite)
+
+    def bullet(self, radius):
+        r = max(1, round(radius * RENDER_SCALE))
+        key = ("bullet", r)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        sprite = pygame.Surface((r * 2 + 1, r * 2 + 1))
+        sprite.set_colorkey((0, 0, 0))
+        pygame.draw.circle(sprite, (255, 255, 255), (r, r), r)
+        return self.add(key, sprite)
+
+sprite_cache = SpriteCache()
+
 class Slider:
     def __init__(self, x, y, width, height, min_val=0.0, max_val=1.0, initial=1.0):
         self.rect = pygame.Rect(x, y, width, height)
@@ -187,51 +728,353 @@ class Slider:
         # Update knob position accordingly
         self.knob_rect.x = self.rect.left + int(self.value * self.rect.width) - self.knob_rect.width // 2
 
+
+class TextRenderer:
+    # Fonts are loaded once per (name, size) and rendered strings are kept by
+    # (font, text, colour) in a bounded LRU, so static text is only rasterised once
+    def __init__(self, max_strings=512):
+        self.max_strings = max_strings
+        self.fonts = {}
+        self.strings = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size, name=None, system=False):
+        key = (name, size, system)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.SysFont(name, size) if system else pygame.font.Font(name, size)
+            self.fonts[key] = font
+        return font
+
+    def render(self, text, color, size=36, name=None, system=False):
+        key = (name, size, system, text, tuple(color))
+        surface = self.strings.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.strings.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.font(size, name, system).render(text, True, color)
+        self.strings[key] = surface
+        if len(self.strings) > self.max_strings:
+            self.strings.popitem(last=False)
+        return surface
+
+text_renderer = TextRenderer()
+
+class DirtyRects:
+    # Dirty rectangle renderer. Each frame only the areas drawn last frame are filled with the
+    # background colour again and only those and the new ones are sent to the display. Anything that covers
+    # more than the tracked objects (a new gradient, the pause overlay, the death screen) calls
+    # invalidate(), which redraws and flips the whole screen instead.
+    # When disabled it behaves like the plain full blit and flip.
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.previous = []
+        self.current = []
+        self.full = True
+        self.restored_all = True
+        self.full_frames = 0
+
+    def invalidate(self):
+        self.full = True
+
+    def restore(self, target, background):
+        self.restored_all = self.full or not self.enabled
+        self.full = False
+        if self.restored_all:
+            target.fill(background)
+        else:
+            for rect in self.previous:
+                target.fill(background, rect)
+
+    def add(self, rects):
+        bounds = screen.get_rect()
+        self.current.extend(rect.clip(bounds) for rect in rects)
+
+    def present(self):
+        if self.restored_all or self.full:
+            self.full_frames += 1
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + self.current)
+        self.previous = self.current
+        self.current = []
+
+class HudPanel:
+    # Translucent box with lines of text. The box surface is kept and only redrawn when the
+    # lines change
+    def __init__(self, width, height, line_height=30):
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.line_height = line_height
+        self.lines = None
+        self.redraws = 0
+
+    def draw(self, target, position, lines, size=36, color=TEXT_COLOR):
+        if lines != self.lines:
+            self.lines = lines
+            self.redraws += 1
+            self.surface.fill(TRANSLUCENT_WHITE)
+            for i, line in enumerate(lines):
+                self.surface.blit(text_renderer.render(line, color, size), (10, 10 + i * self.line_height))
+        return target.blit(self.surface, position)
+
+def percentile(values, q):
+    # Nearest rank percentile of an already sorted list
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+class FrameProfiler:
+    # Times the stages of each frame. mark(stage) adds the time since the previous mark to that
+    # stage, so a stage can be hit several times a frame (physics substeps). While the profiler
+    # is off, mark() returns straight away. Marks from the --pipeline simulation thread are
+    # ignored, its ticks don't belong to any one frame.
+    # F3 shows a rolling graph of the last frames with p50/p95/p99 per stage, and with a log
+    # file every frame is written out as a CSV row (.csv) or a JSON line (anything else)
+    STAGES = ("background", "input", "spawn", "player", "collisions", "gravity", "simulation",
+              "draw_planets", "trajectory", "draw_player", "hud", "profiler", "present")
+    COLORS = ((90, 90, 90), (255, 255, 0), (255, 160, 0), (255, 80, 80), (255, 0, 160), (160, 80, 255),
+              (120, 120, 255), (0, 200, 255), (0, 255, 120), (255, 255, 255), (200, 200, 120),
+              (255, 0, 255), (60, 160, 60))
+    HISTORY = 240  # Frames in the graph and the percentiles
+    SCALE = 4  # Graph pixels per millisecond
+
+    def __init__(self):
+        self.visible = False
+        self.enabled = False
+        self.frame = 0
+        self.last = 0.0
+        self.times = dict.fromkeys(self.STAGES, 0.0)
+        self.history = {stage: [] for stage in self.STAGES}
+        self.lines = []
+        self.graph = None
+        self.backdrop = None
+        self.log = None
+        self.thread = threading.get_ident()
+
+    def start_log(self, path):
+        self.log = open(path, "w")
+        self.csv = path.endswith(".csv")
+        if self.csv:
+            self.log.write(",".join(("frame",) + self.STAGES + ("total",)) + "\n")
+        self.enabled = True
+        atexit.register(self.log.close)
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.enabled = self.visible or self.log is not None
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        for stage in self.STAGES:
+            self.times[stage] = 0.0
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        if not self.enabled or threading.get_ident() != self.thread:
+            return
+        now = time.perf_counter()
+        self.times[stage] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.frame += 1
+        times = self.times
+        for stage in self.STAGES:
+            values = self.history[stage]
+            values.append(times[stage] * 1000)
+            if len(values) > self.HISTORY:
+                del values[0]
+        if self.log:
+            total = sum(times.values())
+            if self.csv:
+                self.log.write(",".join([str(self.frame)] + [f"{times[stage] * 1000:.4f}" for stage in self.STAGES] +
+                                        [f"{total * 1000:.4f}"]) + "\n")
+            else:
+                row = {stage: round(times[stage] * 1000, 4) for stage in self.STAGES}
+                row["frame"], row["total"] = self.frame, round(total * 1000, 4)
+                self.log.write(json.dumps(row) + "\n")
+
+    def draw(self, target):
+        # Graph and percentile table in the bottom left corner, returns the rects it covered
+        if not self.visible or not self.history["present"]:
+            return []
+        height = 30 * self.SCALE
+        if self.graph is None:
+            self.graph = pygame.Surface((self.HISTORY, height))
+            self.graph.fill((0, 0, 0))
+        # Scroll the graph one pixel and stack the stages of the newest frame on the right
+        self.graph.scroll(-1, 0)
+        x = self.HISTORY - 1
+        pygame.draw.line(self.graph, (0, 0, 0), (x, 0), (x, height))
+        y = height
+        for stage, color in zip(self.STAGES, self.COLORS):
+            size = self.history[stage][-1] * self.SCALE
+            if size >= 0.5:
+                pygame.draw.line(self.graph, color, (x, y), (x, y - size))
+            y -= size
+        budget = height - round(1000 / 60 * self.SCALE)  # 60 fps frame budget
+        self.graph.set_at((x, budget), (255, 0, 0))
+        if self.frame % 30 == 0 or not self.lines:
+            self.lines = [("stage (ms)", "p50", "p95", "p99")]
+            for stage in self.STAGES:
+                values = sorted(self.history[stage])
+                self.lines.append((stage,) + tuple(f"{percentile(values, q):.2f}" for q in (50, 95, 99)))
+        top = HEIGHT - height - 18 * len(self.lines) - 20
+        if self.backdrop is None:
+            self.backdrop = pygame.Surface((self.HISTORY + 60, HEIGHT - top), pygame.SRCALPHA)
+            self.backdrop.fill((0, 0, 0, 160))
+        rects = [target.blit(self.backdrop, (0, top - 10)), target.blit(self.graph, (10, HEIGHT - height - 10))]
+        for i, line in enumerate(self.lines):
+            color = self.COLORS[i - 1] if i else TEXT_COLOR
+            for text, x in zip(line, (10, 140, 200, 260)):
+                rects.append(target.blit(text_renderer.render(text, color, 22), (x, top + 18 * i)))
+        return rects
+
+profiler = FrameProfiler()
     
-screen_width, screen_height = screen.get_size()
 slider_width = 300
 slider_height = 20
 slider_spacing = 60
-center_y = screen_height // 2
+center_y = HEIGHT // 2
 music_slider_y = center_y - slider_spacing // 2
 sfx_slider_y = center_y + slider_spacing // 2
-slider_x = (screen_width - slider_width) // 2
+slider_x = (WIDTH - slider_width) // 2
 music_slider = Slider(slider_x, music_slider_y, slider_width, slider_height, initial=0.5)
 sfx_slider = Slider(slider_x, sfx_slider_y, slider_width, slider_height, initial=0.5)
 
 
-# Set initial volumes
-pygame.mixer.music.set_volume(music_slider.get_value())
+class Silence:
+    # Stands in for sounds and mixer channels when running without audio
+    def play(self, *args, **kwargs):
+        pass
+
+    def stop(self):
+        pass
+
+    def fadeout(self, *args):
+        pass
+
+    def set_volume(self, *args):
+        pass
+
+class Assets:
+    # Sounds are decoded the first time they are needed instead of all at import. preload()
+    # decodes some ahead of time on a background thread, release() forgets one so its samples are
+    # freed as soon as no channel is playing it. Decoding happens outside the lock, so asking for
+    # a sound that is ready never waits on another one being decoded
+    def __init__(self):
+        self.sounds = {}
+        self.loading = {}  # Path -> Event that is set when the thread decoding it is done
+        self.lock = threading.Lock()
+        self.loads = 0
+
+    def get(self, path):
+        with self.lock:
+            sound = self.sounds.get(path)
+            if sound is not None:
+                return sound
+            done = self.loading.get(path)
+            decode = done is None
+            if decode:
+                done = self.loading[path] = threading.Event()
+        if not decode:
+            done.wait()  # Someone else is decoding it already
+            return self.get(path)
+        try:
+            sound = pygame.mixer.Sound(path) if AUDIO else Silence()
+            with self.lock:
+                self.sounds[path] = sound
+                self.loads += 1
+        finally:
+            with self.lock:
+                del self.loading[path]
+            done.set()
+        return sound
+
+    def peek(self, path):
+        # The sound if it is decoded already, otherwise None
+        with self.lock:
+            return self.sounds.get(path)
+
+    def preload(self, paths):
+        with self.lock:
+            paths = [path for path in paths if path not in self.sounds and path not in self.loading]
+        if not paths:
+            return None
+        thread = threading.Thread(target=lambda: [self.get(path) for path in paths], daemon=True)
+        thread.start()
+        return thread
+
+    def release(self, path):
+        with self.lock:
+            self.sounds.pop(path, None)
+
+assets = Assets()
+
+class LazySound:
+    # Sound effect that is only decoded the first time it is played
+    def __init__(self, path, volume=1.0):
+        self.path = path
+        self.volume = volume
+        self.sound = None
+
+    def load(self):
+        if self.sound is None:
+            self.sound = assets.get(self.path)
+            self.sound.set_volume(self.volume)
+        return self.sound
+
+    def play(self, *args, **kwargs):
+        return self.load().play(*args, **kwargs)
+
+    def stop(self):
+        if self.sound is not None:
+            self.sound.stop()
+
+    def set_volume(self, volume):
+        self.volume = volume
+        if self.sound is not None:
+            self.sound.set_volume(volume)
+
+def load_sound(path):
+    return LazySound(path)
 
-shoot_sound = pygame.mixer.Sound("sounds/shoot.ogg")
+# Set initial volumes
+shoot_sound = load_sound("sounds/shoot.ogg")
 shoot_sound.set_volume(sfx_slider.get_value())
 
-explosion_sound = pygame.mixer.Sound("sounds/break.ogg")
+explosion_sound = load_sound("sounds/break.ogg")
 explosion_sound.set_volume(0.4*sfx_slider.get_value())
 
-thrusting_sound = pygame.mixer.Sound("sounds/thrusting.ogg")
+thrusting_sound = load_sound("sounds/thrusting.ogg")
 thrusting_sound.set_volume(0.2*sfx_slider.get_value())
 thrusting = False
 
-delta_sound = pygame.mixer.Sound("sounds/deltarune.ogg")
+delta_sound = load_sound("sounds/deltarune.ogg")
 delta_sound.set_volume(0.5*sfx_slider.get_value())
 
+# Only the playing tier and the one being switched to are kept decoded, see switch_music
 music_tracks = {
-    "low": pygame.mixer.Sound("music/low.ogg"),
-    "mid": pygame.mixer.Sound("music/mid.ogg"),
-    "high": pygame.mixer.Sound("music/high.ogg")
+    "low": "music/low.ogg",
+    "mid": "music/mid.ogg",
+    "high": "music/high.ogg"
 }
 
-# Two channels for alternating playback
-channel_a = pygame.mixer.Channel(0)
-channel_b = pygame.mixer.Channel(1)
+# Two channels for alternating playback, silent until init_display() sets up the mixer
+channel_a, channel_b = Silence(), Silence()
 
 # Keep track of which channel is active
 current_channel = channel_a
 current_music_level = None
+pending_music_level = None  # Tier to switch to once its track is decoded
 
 def update_music(points, fade_time=1000):
-    global current_music_level, current_channel
+    # Pick the tier for the score, switch_music() starts it once its track is decoded
+    global pending_music_level
 
     if points < 50:
         new_level = "low"
@@ -240,40 +1083,141 @@ def update_music(points, fade_time=1000):
     else:
         new_level = "high"
 
-    if new_level != current_music_level:
-        next_track = music_tracks[new_level]
-        next_channel = channel_b if current_channel == channel_a else channel_a
-
-        # Set volume based on slider before playing
-        next_channel.set_volume(music_slider.get_value())
-
-        # Start the new track with fade-in
-        next_channel.play(next_track, loops=-1, fade_ms=fade_time)
-
-        # Fade out the current channel
-        current_channel.fadeout(fade_time)
-
-        # Swap channels
-        current_channel = next_channel
-        current_music_level = new_level
-
-
-
-class Bullet:
-    def __init__(self, x, y, angle):
-        self.x = x
-        self.y = y
-        self.angle = angle
-        self.speed = BULLET_SPEED
-        self.radius = 5
+    pending_music_level = new_level if new_level != current_music_level else None
+    switch_music(fade_time)
+
+def switch_music(fade_time=1000):
+    # Called every frame. A tier whose track is not decoded yet stays pending, the old tier keeps
+    # playing until the loader thread has it. Only the playing tier and the pending one are kept
+    # decoded, the rest is released and a channel still fading it out keeps it alive until the
+    # fade is over
+    global current_music_level, current_channel, pending_music_level
+
+    if pending_music_level is None:
+        return
+    keep = {current_music_level, pending_music_level}
+    for level, path in music_tracks.items():
+        if level not in keep:
+            assets.release(path)
+    next_track = assets.peek(music_tracks[pending_music_level])
+    if next_track is None:
+        assets.preload([music_tracks[pending_music_level]])
+        return
+    next_channel = channel_b if current_channel == channel_a else channel_a
+
+    # Set volume based on slider before playing
+    next_channel.set_volume(music_slider.get_value())
+
+    # Start the new track with fade-in
+    next_channel.play(next_track, loops=-1, fade_ms=fade_time)
+
+    # Fade out the current channel
+    current_channel.fadeout(fade_time)
+    if current_music_level is not None:
+        assets.release(music_tracks[current_music_level])
+
+    # Swap channels
+    current_channel = next_channel
+    current_music_level = pending_music_level
+    pending_music_level = None
+
+def interpolate(entity, alpha):
+    # Position between the last two physics ticks, alpha 0 is the previous tick and 1 the latest
+    return (entity.prev_x + (entity.x - entity.prev_x) * alpha,
+            entity.prev_y + (entity.y - entity.prev_y) * alpha)
+
+class BulletPool:
+    # All of the player's bullets as parallel lists with MAX_BULLETS preallocated slots. Live
+    # bullets are kept packed in slots 0..count-1 in the order they were fired (the collision
+    # order depends on it), velocities are worked out once when a bullet is fired, and bullets
+    # that hit a planet are marked in the alive mask and packed away at the end of the tick
+    def __init__(self, capacity=MAX_BULLETS, radius=5, speed=BULLET_SPEED):
+        self.capacity = capacity
+        self.radius = radius
+        self.speed = speed
+        self.count = 0
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.prev_x = [0.0] * capacity  # Position at the previous physics tick, for drawing
+        self.prev_y = [0.0] * capacity
+        self.vx = [0.0] * capacity
+        self.vy = [0.0] * capacity
+        self.angle = [0] * capacity
+        self.alive = [False] * capacity
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x, y, angle):
+        if self.count >= self.capacity:
+            return False
+        i = self.count
+        rad_angle = math.radians(angle)
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.vx[i] = self.speed * math.cos(rad_angle)
+        self.vy[i] = -(self.speed * math.sin(rad_angle))  # Negative because Pygame's y-axis is inverted
+        self.angle[i] = angle
+        self.alive[i] = True
+        self.count += 1
+        return True
+
+    def move(self, i, j):
+        self.x[j], self.y[j] = self.x[i], self.y[i]
+        self.prev_x[j], self.prev_y[j] = self.prev_x[i], self.prev_y[i]
+        self.vx[j], self.vy[j], self.angle[j] = self.vx[i], self.vy[i], self.angle[i]
+        self.alive[j] = True
 
     def update(self):
-        rad_angle = math.radians(self.angle)
-        self.x += self.speed * math.cos(rad_angle)
-        self.y -= self.speed * math.sin(rad_angle)  # Negative because Pygame's y-axis is inverted
-
-    def draw(self, screen):
-        pygame.draw.circle(screen, (255, 255, 255), (int(self.x), int(self.y)), self.radius)
+        # One pass that drops bullets already off screen (fired from outside it), moves the rest
+        # and drops the ones that left the screen
+        r = self.radius
+        scale = TICK_SCALE
+        kept = 0
+        for i in range(self.count):
+            x, y = self.x[i], self.y[i]
+            if x < -r or x > WIDTH + r or y < -r or y > HEIGHT + r:
+                continue
+            self.prev_x[i], self.prev_y[i] = x, y
+            x += self.vx[i] * scale
+            y += self.vy[i] * scale
+            self.x[i], self.y[i] = x, y
+            if 0 < x < WIDTH and 0 < y < HEIGHT:
+                if kept != i:
+                    self.move(i, kept)
+                kept += 1
+        self.count = kept
+
+    def hits(self, i, planet):
+        distance = math.sqrt((self.x[i] - planet.x)**2 + (self.y[i] - planet.y)**2)
+        return distance < self.radius + planet.radius
+
+    def sweep_hits(self, i, planet):
+        # Whether the bullet touched the planet anywhere along this tick's movement
+        px, py = self.prev_x[i], self.prev_y[i]
+        return swept_contact(px, py, self.x[i] - px, self.y[i] - py, planet.x, planet.y, 0, 0,
+                             self.radius + planet.radius) is not None
+
+    def remove_spent(self):
+        kept = 0
+        for i in range(self.count):
+            if self.alive[i]:
+                if kept != i:
+                    self.move(i, kept)
+                kept += 1
+        self.count = kept
+
+def draw_ship(screen, x, y, angle, color, width=0):
+    # The player's triangle pointing at angle degrees, x and y are already in screen pixels
+    scale = RENDER_SCALE
+    rad_angle = math.radians(angle)
+    front_x = x + 20 * scale * math.cos(rad_angle)
+    front_y = y - 20 * scale * math.sin(rad_angle)
+    left_x = x + 10 * scale * math.cos(rad_angle + math.pi / 2)
+    left_y = y - 10 * scale * math.sin(rad_angle + math.pi / 2)
+    right_x = x + 10 * scale * math.cos(rad_angle - math.pi / 2)
+    right_y = y - 10 * scale * math.sin(rad_angle - math.pi / 2)
+    return pygame.draw.polygon(screen, color, [(front_x, front_y), (left_x, left_y), (right_x, right_y)], width)
 
 class Player:
     def __init__(self, x, y, angle, radius):
@@ -284,17 +1228,22 @@ class Player:
         self.vy = 0  # Velocity in the y direction
         self.max_speed = MAX_PLAYER_SPEED
         self.acceleration = 0.1  # Acceleration
-        self.bullets = []
+        self.bullets = BulletPool()
         self.is_moving = False  # To track if the player is holding the move button
         self.radius = radius
         self.points = 10
         self.mass = (10/5)**0.5
+        self.prev_x, self.prev_y = x, y
+        # Stats for the leaderboard
+        self.ticks = 0
+        self.shots = 0
+        self.splits = 0
 
     def move_forward(self):
         # Apply acceleration to the velocity
         rad_angle = math.radians(self.angle)
-        self.vx += self.acceleration * math.cos(rad_angle)
-        self.vy -= self.acceleration * math.sin(rad_angle)  # Negative because Pygame's y-axis is inverted
+        self.vx += self.acceleration * TICK_SCALE * math.cos(rad_angle)
+        self.vy -= self.acceleration * TICK_SCALE * math.sin(rad_angle)  # Negative because Pygame's y-axis is inverted
 
         # Limit the velocity to the max speed
         speed = math.sqrt(self.vx ** 2 + self.vy ** 2)
@@ -304,113 +1253,98 @@ class Player:
             self.vy *= scale
 
     def turn_left(self):
-        self.angle = (self.angle + 3) % 360
+        self.angle = (self.angle + 3 * TICK_SCALE) % 360
 
     def turn_right(self):
-        self.angle = (self.angle - 3) % 360
+        self.angle = (self.angle - 3 * TICK_SCALE) % 360
 
     def shoot(self):
-        if len(self.bullets) < MAX_BULLETS:
-            bullet = Bullet(self.x, self.y, self.angle)
-            self.bullets.append(bullet)
+        if self.bullets.add(self.x, self.y, self.angle):
+            self.shots += 1
             shoot_sound.play()
 
     def update(self, planets):
-        gravity_x, gravity_y = self.player_gravity(planets)      
-        magnitude = (gravity_x**2 + gravity_y**2)**0.5
-        if magnitude != 0:
-            norm_x = gravity_x / magnitude
-            norm_y = gravity_y / magnitude
-        else:
-            norm_x, norm_y = 0, 0  # This could be any direction you prefer
-        #pygame.draw.line(screen, (0, 255, 0, 128), (self.x, self.y), (self.x + norm_x * 25, self.y + norm_y * 25), 6)  # Green, longer, translucent arrow
-        
-        # Update position based on velocity and gravity
-        self.vx += gravity_x  # Apply gravity to velocity
-        self.vy += gravity_y  # Apply gravity to velocity
-        
-        # Update position based on velocity
-        self.x += self.vx
-        self.y += self.vy
-
-        # Update bullets
-        for bullet in self.bullets:
-            bullet.update()
+        # Apply gravity to the velocity and move, one tick with the selected integrator
+        self.x, self.y, self.vx, self.vy = INTEGRATORS[INTEGRATOR](self.x, self.y, self.vx, self.vy, TICK_SCALE,
+                                                                   self.gravity_field(planets))
 
-        # Remove bullets that go out of bounds
-        self.bullets = [bullet for bullet in self.bullets if 0 < bullet.x < WIDTH and 0 < bullet.y < HEIGHT]
+        # Update bullets and remove the ones that go out of bounds
+        self.bullets.update()
 
-    def draw(self, screen):
-        # Draw player as a triangle
-        rad_angle = math.radians(self.angle)
-        front_x = self.x + 20 * math.cos(rad_angle)
-        front_y = self.y - 20 * math.sin(rad_angle)
-        left_x = self.x + 10 * math.cos(rad_angle + math.pi / 2)
-        left_y = self.y - 10 * math.sin(rad_angle + math.pi / 2)
-        right_x = self.x + 10 * math.cos(rad_angle - math.pi / 2)
-        right_y = self.y - 10 * math.sin(rad_angle - math.pi / 2)
-
-        pygame.draw.polygon(screen, (255, 255, 255), [(front_x, front_y), (left_x, left_y), (right_x, right_y)])
-
-        # Draw bullets
-        for bullet in self.bullets:
-            bullet.draw(screen)
-            
     def offscreen(self):
         #        if self.x < -self.radius or self.x > WIDTH + self.radius or self.y < -self.radius or self.y > HEIGHT + self.radius:
         if self.x < 0 or self.x > WIDTH or self.y < 0 or self.y > HEIGHT:
             self.x = WIDTH // 2
             self.y = HEIGHT // 2
+            self.prev_x, self.prev_y = self.x, self.y  # Don't draw a streak across the screen
             self.vx = 0
             self.vy = 0
             self.points -= 40
-        # Using list comprehension to filter bullets within screen bounds
-        self.bullets = [bullet for bullet in self.bullets if not (bullet.x < -bullet.radius or bullet.x > WIDTH + bullet.radius or bullet.y < -bullet.radius or bullet.y > HEIGHT + bullet.radius)]
+        # Bullets outside the screen are dropped by BulletPool.update()
         
     def player_gravity(self, planets):
+        return self.gravity_field(planets)(self.x, self.y)
+
+    def gravity_field(self, planets):
+        # Gravity at any point for the current planets, integrators sample it away from the player
         mass = self.mass
-        gravity_x, gravity_y = 0, 0
-        for planet in planets:
-            dx = planet.x - self.x
-            dy = planet.y - self.y
-            distance = math.sqrt(dx**2 + dy**2)
-            if distance == 0:
-                continue  # Skip if no distance to avoid division by zero
-            force = GRAVITY_CONSTANT/2 * mass * planet.mass / distance**2  # Simplified gravitational force
-            angle = math.atan2(dy, dx)
-            gravity_x += force * math.cos(angle)
-            gravity_y += force * math.sin(angle)
-        
-        return gravity_x.real, gravity_y.real
+        if PHYSICS_BACKEND == "barnes-hut" and len(planets) >= BARNES_HUT_MIN_BODIES:
+            return barnes_hut_player_field(self, planets)
+
+        def field(x, y):
+            gravity_x, gravity_y = 0, 0
+            for planet in planets:
+                dx = planet.x - x
+                dy = planet.y - y
+                distance = math.sqrt(dx**2 + dy**2)
+                if distance == 0:
+                    continue  # Skip if no distance to avoid division by zero
+                force = GRAVITY_CONSTANT/2 * mass * planet.mass / distance**2  # Simplified gravitational force
+                angle = math.atan2(dy, dx)
+                gravity_x += force * math.cos(angle)
+                gravity_y += force * math.sin(angle)
+            return gravity_x.real, gravity_y.real
+        return field
 
 
 # Planet class
 class Planet:
-    def __init__(self, x, y, mass, velocity, color):
+    # Planets are slotted and recycled through planet_pool, splits, merges and planets leaving
+    # the screen would otherwise make a steady stream of garbage
+    __slots__ = ("x", "y", "mass", "velocity", "radius", "color", "glow_texture", "name",
+                 "prev_x", "prev_y", "generation")
+
+    def __init__(self, x, y, mass, velocity, color, name=None, radius=None):
+        self.velocity = [0.0, 0.0]
+        self.generation = 0  # Goes up every time the object is released to planet_pool
+        self.reset(x, y, mass, velocity, color, name, radius)
+
+    def reset(self, x, y, mass, velocity, color, name=None, radius=None):
         self.x = x
         self.y = y
         self.mass = mass
-        self.velocity = velocity
-        self.radius = int((mass ** (3/4)) * PLANET_RADIUS_SCALE)
+        self.velocity[0], self.velocity[1] = velocity
+        self.radius = int((mass ** (3/4)) * PLANET_RADIUS_SCALE) if radius is None else radius
         self.color = color
-        self.glow_texture = create_glow_texture(int(self.radius*3), self.color, self.mass)
-        self.name = self.generate_name()
+        self.refresh_glow()
+        self.name = self.generate_name() if name is None else name
+        self.prev_x, self.prev_y = x, y
 
     def generate_name(self):
         # Scientific-sounding name generation using prefixes and suffixes
         prefixes = ["Alpha", "Beta", "Gamma", "Zeta", "Delta", "Epsilon"]
         suffixes = ["Centauri", "Taurus", "Nebula", "Andromeda", "Aurora", "Pulsar"]
-        prefix = random.choice(prefixes)
-        suffix = random.choice(suffixes)
+        prefix = game_rng.choice(prefixes)
+        suffix = game_rng.choice(suffixes)
         return f"{prefix} {suffix}"
 
-    def draw(self):
-        # Draw the glow effect using the planet's color
-        glow_rect = self.glow_texture.get_rect(center=(self.x, self.y))
-        screen.blit(self.glow_texture, glow_rect)
-        
-        # Draw the planet itself
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.radius)
+    def refresh_glow(self):
+        # Pick up the glow texture for the current size, colour and mass. Headless runs never
+        # draw, so they don't build any
+        if HEADLESS:
+            self.glow_texture = None
+            return
+        self.glow_texture = glow_cache.get(int(self.radius*3*RENDER_SCALE), self.color, self.mass)
 
     def update_position(self, time_scale):
         self.x += self.velocity[0] * time_scale
@@ -423,17 +1357,17 @@ class Planet:
         # Check if the mouse click is inside the planet's circle
         return (mouse_x - self.x) ** 2 + (mouse_y - self.y) ** 2 <= self.radius ** 2
     
-    def split(self, bullet):
+    def split(self, bullet_angle, bullet_speed=BULLET_SPEED):
             # Split the planet into two smaller planets with adjusted mass and velocity        
-            rad_angle = math.radians(bullet.angle)
+            rad_angle = math.radians(bullet_angle)
             
-            perp_velocity_x =bullet.speed * math.sin(rad_angle) 
-            perp_velocity_y =bullet.speed * math.cos(rad_angle)
+            perp_velocity_x =bullet_speed * math.sin(rad_angle) 
+            perp_velocity_y =bullet_speed * math.cos(rad_angle)
 
             x = math.sin(rad_angle) * self.radius * (1/2**(0.5))
             y = math.cos(rad_angle)* self.radius * (1/2**(0.5))
             
-            new_planet_1 = Planet(
+            new_planet_1 = planet_pool.new(
                 x=self.x + x,
                 y=self.y + y, 
                 velocity = [perp_velocity_x, perp_velocity_y], 
@@ -441,7 +1375,7 @@ class Planet:
                 color = self.color
             )
 
-            new_planet_2 = Planet(
+            new_planet_2 = planet_pool.new(
                 x=self.x - x, 
                 y=self.y - y,
                 velocity = [-perp_velocity_x, -perp_velocity_y], #im gonna kms
@@ -454,17 +1388,17 @@ class Planet:
 def spawn_planet(x=None, y=None):
     if x is None or y is None:
         # Spawn planet randomly off-screen
-        side = random.choice(["left", "right", "top", "bottom"])
+        side = game_rng.choice(["left", "right", "top", "bottom"])
         if side == "left":
-            x, y = -20, random.randint(0, HEIGHT)
+            x, y = -20, game_rng.randint(0, HEIGHT)
         elif side == "right":
-            x, y = WIDTH + 20, random.randint(0, HEIGHT)
+            x, y = WIDTH + 20, game_rng.randint(0, HEIGHT)
         elif side == "top":
-            x, y = random.randint(0, WIDTH), -20
+            x, y = game_rng.randint(0, WIDTH), -20
         else:
-            x, y = random.randint(0, WIDTH), HEIGHT + 20
+            x, y = game_rng.randint(0, WIDTH), HEIGHT + 20
 
-    mass = random.uniform(5, 50)
+    mass = game_rng.uniform(5, 50)
 
     # Constrain velocity to ensure the planet moves into the visible area
     direction_x = WIDTH / 2 - x
@@ -476,29 +1410,152 @@ def spawn_planet(x=None, y=None):
     direction_y /= distance
 
     # Add random variation to the initial velocity
-    angle_bias = random.uniform(-math.pi / 6, math.pi / 6)  # Random angle bias
-    speed = random.uniform(0.5, 2.0)  # Adjust speed range as needed
+    angle_bias = game_rng.uniform(-math.pi / 6, math.pi / 6)  # Random angle bias
+    speed = game_rng.uniform(0.5, 2.0)  # Adjust speed range as needed
     velocity = [
         speed * (direction_x * math.cos(angle_bias) - direction_y * math.sin(angle_bias)),
         speed * (direction_x * math.sin(angle_bias) + direction_y * math.cos(angle_bias)),
     ]
     
     color = (
-        random.randint(50, 255),  # Random red component
-        random.randint(50, 255),  # Random green component
-        random.randint(50, 255),  # Random blue component
+        game_rng.randint(50, 255),  # Random red component
+        game_rng.randint(50, 255),  # Random green component
+        game_rng.randint(50, 255),  # Random blue component
     )
-    return Planet(x, y, mass, velocity, color)
-
-def calculate_gravitational_force(planet1, planet2):
-    dx = planet2.x - planet1.x
-    dy = planet2.y - planet1.y
-    distance = math.sqrt(dx**2 + dy**2)
-    if distance <= planet1.radius + planet2.radius:
-        return None  # Collision
-    force = GRAVITY_CONSTANT * planet1.mass * planet2.mass / distance**1.75
-    angle = math.atan2(dy, dx)
-    return force * math.cos(angle), force * math.sin(angle)
+    return planet_pool.new(x, y, mass, velocity, color)
+
+class PlanetPool:
+    # Free list of Planet objects. Planets that leave the game are released here and reused by
+    # the next spawn or split. Releasing bumps the planet's generation, so a handle taken with
+    # handle() stops resolving once its planet is gone, even if the object is reused
+    def __init__(self):
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def new(self, x, y, mass, velocity, color, name=None, radius=None):
+        if not self.free:
+            self.created += 1
+            return Planet(x, y, mass, velocity, color, name, radius)
+        self.reused += 1
+        planet = self.free.pop()
+        planet.reset(x, y, mass, velocity, color, name, radius)
+        return planet
+
+    def release(self, planet):
+        planet.generation += 1
+        planet.glow_texture = None
+        self.free.append(planet)
+
+    def handle(self, planet):
+        return (planet, planet.generation)
+
+    def get(self, handle):
+        # The planet of a handle, or None when there is no handle or the planet was released
+        if handle is None:
+            return None
+        planet, generation = handle
+        return planet if planet.generation == generation else None
+
+planet_pool = PlanetPool()
+
+def remove_planets(planets, to_remove):
+    # Drop the planets at the to_remove indices in place and give them back to planet_pool
+    kept = 0
+    for i, planet in enumerate(planets):
+        if i in to_remove:
+            planet_pool.release(planet)
+        else:
+            planets[kept] = planet
+            kept += 1
+    del planets[kept:]
+
+class GCStats:
+    # Garbage collector runs and the time the game spent paused in them
+    def __init__(self):
+        self.collections = [0, 0, 0]
+        self.paused = 0.0
+        self.longest = 0.0
+        self.started = 0.0
+
+    def callback(self, phase, info):
+        if phase == "start":
+            self.started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self.started
+        self.collections[info["generation"]] += 1
+        self.paused += pause
+        self.longest = max(self.longest, pause)
+
+    def stats(self):
+        return {
+            "collections": self.collections,
+            "paused_ms": round(self.paused * 1000, 2),
+            "longest_ms": round(self.longest * 1000, 3),
+            "planets_created": planet_pool.created,
+            "planets_reused": planet_pool.reused,
+        }
+
+gc_stats = GCStats()
+
+def step_planets(planets, to_remove, time_scale=TIME_SCALE):
+    if PHYSICS_BACKEND == "barnes-hut":
+        step_planets_numpy(planets, to_remove, time_scale, theta=BARNES_HUT_THETA, tick_scale=TICK_SCALE)
+    elif PHYSICS_BACKEND == "numpy":
+        step_planets_numpy(planets, to_remove, time_scale, tick_scale=TICK_SCALE)
+    else:
+        step_planets_python(planets, to_remove, time_scale, TICK_SCALE)
+
+def barnes_hut_player_field(player, planets, theta=None):
+    # Same field as Player.gravity_field, with the planets grouped in a quadtree that is built
+    # once and reused for every point the integrator asks about
+    x = np.array([planet.x for planet in planets], dtype=float)
+    y = np.array([planet.y for planet in planets], dtype=float)
+    mass = np.array([planet.mass for planet in planets], dtype=float)
+    radius = np.array([planet.radius for planet in planets], dtype=float)
+    tree = QuadTree(x, y, mass, radius)
+    theta = BARNES_HUT_THETA if theta is None else theta
+    scale = GRAVITY_CONSTANT/2 * player.mass
+
+    def field(point_x, point_y):
+        acc_x, acc_y, _ = tree.accelerations(np.array([point_x], dtype=float), np.array([point_y], dtype=float),
+                                             np.zeros(1), 3, theta)
+        return float(acc_x[0] * scale), float(acc_y[0] * scale)
+    return field
+
+def make_benchmark_planets(count, seed=0):
+    # Planets on a jittered grid, sized so none of them touch at the start
+    rng = random.Random(seed)
+    cols = math.ceil(math.sqrt(count * WIDTH / HEIGHT))
+    rows = math.ceil(count / cols)
+    cell = min(WIDTH / cols, HEIGHT / rows)
+    max_mass = min(50, (cell * 0.3 / PLANET_RADIUS_SCALE) ** (4 / 3))
+    bodies = []
+    for k in range(count):
+        mass = rng.uniform(max_mass / 4, max_mass)
+        body = Planet.__new__(Planet)
+        body.x = (k % cols + 0.5 + rng.uniform(-0.1, 0.1)) * cell
+        body.y = (k // cols + 0.5 + rng.uniform(-0.1, 0.1)) * cell
+        body.mass = mass
+        body.velocity = [rng.uniform(-1, 1), rng.uniform(-1, 1)]
+        body.radius = int((mass ** (3/4)) * PLANET_RADIUS_SCALE)
+        body.color = (rng.randint(50, 255), rng.randint(50, 255), rng.randint(50, 255))
+        body.glow_texture = None
+        body.name = "Benchmark"
+        body.prev_x, body.prev_y = body.x, body.y
+        body.generation = 0
+        bodies.append(body)
+    return bodies
+
+def copy_planets(bodies):
+    copies = []
+    for body in bodies:
+        copy = Planet.__new__(Planet)
+        for name in Planet.__slots__:
+            setattr(copy, name, getattr(body, name))
+        copy.velocity = list(body.velocity)
+        copies.append(copy)
+    return copies
 
 def is_space_empty(x, y, planets, min_distance=50):
     # Check if the space is empty (i.e., the distance from any planet is greater than a threshold)
@@ -513,38 +1570,113 @@ def check_collision(entity, target):
     distance = math.sqrt((entity.x - target.x)**2 + (entity.y - target.y)**2)
     return distance < entity.radius + target.radius
 
-def show_death_screen():
-
-    save_settings(settings)
+def check_swept_collision(entity, target):
+    # check_collision along the entity's movement this tick, target stands still
+    return swept_contact(entity.prev_x, entity.prev_y, entity.x - entity.prev_x, entity.y - entity.prev_y,
+                         target.x, target.y, 0, 0, entity.radius + target.radius) is not None
+
+def sweep_planets(planets, to_remove, time_scale=TIME_SCALE):
+    # Merges for planets that passed through each other during this tick's step: touching
+    # neither before nor after, but somewhere in between. The pair meets at the time of impact
+    # and the survivor carries on with the merged velocity for the rest of the tick.
+    # A pair that moved less than the smaller radius relative to each other can't have passed
+    # through, so nothing is swept unless some planet moved more than half the smallest radius
+    count = len(planets)
+    if count < 2:
+        return
+    fastest = max((planet.x - planet.prev_x)**2 + (planet.y - planet.prev_y)**2 for planet in planets)
+    smallest = min(planet.radius for planet in planets)
+    if 4 * fastest <= smallest * smallest:
+        return
+    use_grid = count * (count - 1) // 2 >= BROAD_PHASE_MIN_PAIRS
+    if use_grid:
+        collision_grid.clear(planet_cell_size(planets))
+        for i, planet in enumerate(planets):
+            if i not in to_remove:
+                collision_grid.insert(i, *swept_circle(planet.prev_x, planet.prev_y, planet.x, planet.y, planet.radius))
+    for i, planet in enumerate(planets):
+        if i in to_remove:
+            continue
+        if use_grid:
+            nearby = collision_grid.query(*swept_circle(planet.prev_x, planet.prev_y, planet.x, planet.y, planet.radius))
+        else:
+            nearby = range(i + 1, count)
+        for j in nearby:
+            if j <= i or j in to_remove:
+                continue
+            other_planet = planets[j]
+            reach = planet.radius + other_planet.radius
+            if (planet.x - other_planet.x)**2 + (planet.y - other_planet.y)**2 <= reach * reach:
+                continue  # Still touching, the next step merges them
+            dx, dy = planet.x - planet.prev_x, planet.y - planet.prev_y
+            other_dx, other_dy = other_planet.x - other_planet.prev_x, other_planet.y - other_planet.prev_y
+            smaller_radius = min(planet.radius, other_planet.radius)
+            if (dx - other_dx)**2 + (dy - other_dy)**2 <= smaller_radius * smaller_radius:
+                continue  # Too slow to pass through each other
+            t = swept_contact(planet.prev_x, planet.prev_y, dx, dy,
+                              other_planet.prev_x, other_planet.prev_y, other_dx, other_dy, reach)
+            if t is None or t == 0:
+                continue  # Missed, or touching at the start which the step already handled
+            absorbed = merge_planets(planet, other_planet)
+            if absorbed is None:
+                to_remove.add(i)
+                to_remove.add(j)
+            elif absorbed is planet:
+                to_remove.add(i)
+                other_planet.x = other_planet.prev_x + other_dx * t + other_planet.velocity[0] * time_scale * (1 - t)
+                other_planet.y = other_planet.prev_y + other_dy * t + other_planet.velocity[1] * time_scale * (1 - t)
+            else:
+                to_remove.add(j)
+                planet.x = planet.prev_x + dx * t + planet.velocity[0] * time_scale * (1 - t)
+                planet.y = planet.prev_y + dy * t + planet.velocity[1] * time_scale * (1 - t)
+            break  # One merge per planet per tick, like the step
+
+def planet_cell_size(planets):
+    # Cells about one average planet across: most planets cover at most four cells
+    if not planets:
+        return 64
+    return max(16, 2 * sum(planet.radius for planet in planets) / len(planets))
+
+def show_death_screen(cause):
+
+    settings.record_score(player.points)
+    settings.update(music_volume=music_slider.get_value(), sfx_volume=sfx_slider.get_value())
+    name = settings["player_name"] or "player"
+    leaderboard.record(name, player.points, cause, player.ticks * PHYSICS_DT, player.shots, player.splits)
+    rank, runs = leaderboard.rank(player.points)
     screen.fill(BLACK)
 
     # Display "You Died"
     if thrusting:
         thrusting_sound.stop()
     delta_sound.play()
-    font = pygame.font.Font(None, 74)
-    died_text = font.render("You Died", True, (255, 0, 0))
-    if player.points > 0:
-        reason_text = font.render("Reason: planet collision", True, (128, 128, 128))
+    died_text = text_renderer.render("You Died", (255, 0, 0), 74)
+    if cause == "collision":
+        reason_text = text_renderer.render("Reason: planet collision", (128, 128, 128), 74)
     else:
-        reason_text = font.render("Reason: ran out of points", True, (128, 128, 128))
+        reason_text = text_renderer.render("Reason: ran out of points", (128, 128, 128), 74)
     died_text_rect = died_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 100))
     reason_text_rect = reason_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 50))
     screen.blit(died_text, died_text_rect)
     screen.blit(reason_text, reason_text_rect)
 
     # Display points with a smaller font
-    points_font = pygame.font.Font(None, 50)  # Smaller font size
-    points_text = points_font.render(f"Points: {player.points}", True, (255, 255, 255))
+    points_text = text_renderer.render(f"Points: {player.points}", (255, 255, 255), 50)  # Smaller font size
     points_text_rect = points_text.get_rect(center=(WIDTH // 2, HEIGHT // 2))
     screen.blit(points_text, points_text_rect)
 
     # Display restart instructions
-    restart_font = pygame.font.Font(None, 36)
-    restart_text = restart_font.render("Press R to Restart or Q to Quit", True, (255, 255, 255))
+    restart_text = text_renderer.render("Press R to Restart or Q to Quit", (255, 255, 255), 36)
     restart_text_rect = restart_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 50))
     screen.blit(restart_text, restart_text_rect)
 
+    # Rank among every recorded run, and the top 10 down the right side
+    rank_text = text_renderer.render(f"Rank {rank} of {runs}   Best: {leaderboard.best(name)}", (128, 128, 128), 36)
+    screen.blit(rank_text, rank_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 100)))
+    screen.blit(text_renderer.render("Top 10", (255, 255, 255), 36), (WIDTH - 300, 100))
+    for place, (top_name, top_points) in enumerate(leaderboard.top(10), 1):
+        screen.blit(text_renderer.render(f"{place}. {top_name}: {top_points}", (200, 200, 200), 30),
+                    (WIDTH - 300, 100 + place * 30))
 
     pygame.display.flip()
 
@@ -565,8 +1697,503 @@ def reset_game():
     global player, planets
     # Reinitialize the player and planets
     player = Player(WIDTH // 2, HEIGHT // 2, 0, 15)
+    for planet in planets:
+        planet_pool.release(planet)
     planets = []  # Clear the existing planets
-    
+
+class Controls:
+    # Player input for one tick, read from the keyboard and mouse or from an InputScript
+    def __init__(self, left=False, right=False, up=False, shots=0, spawns=None):
+        self.left = left
+        self.right = right
+        self.up = up
+        self.shots = shots  # Number of times space was pressed
+        self.spawns = spawns if spawns is not None else []  # Right clicks as (x, y)
+
+    # Held keys and a shot packed in one small int, used as the action of GravitroidsEnv
+    LEFT, RIGHT, UP, SHOOT = 1, 2, 4, 8
+
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(bool(bits & cls.LEFT), bool(bits & cls.RIGHT), bool(bits & cls.UP), 1 if bits & cls.SHOOT else 0)
+
+    def to_bits(self):
+        return ((self.LEFT if self.left else 0) | (self.RIGHT if self.right else 0) |
+                (self.UP if self.up else 0) | (self.SHOOT if self.shots else 0))
+
+    def next_tick(self):
+        # Controls for the following tick: the held keys, and the shots this tick had no room for
+        return Controls(self.left, self.right, self.up, max(0, self.shots - MAX_SHOTS))
+
+def place_planet(x, y):
+    # If the player clicked on empty space, create a new planet
+    if is_space_empty(x, y, planets):
+        planets.append(spawn_planet(x, y))
+    else:
+        print("Clicked too close to an existing planet")
+
+def simulate_tick(controls):
+    # Advance the player, bullets and planets by one tick. Returns "collision" or "points"
+    # when the player dies, the caller decides what happens next
+    global thrusting
+    # Keep the current positions so frames drawn before the next tick can interpolate
+    player.prev_x, player.prev_y = player.x, player.y  # Bullets keep theirs in BulletPool.update()
+    for planet in planets:
+        planet.prev_x, planet.prev_y = planet.x, planet.y
+    player.mass = (player.points)/5**2
+    player.ticks += 1
+    if controls.left:
+        player.turn_left()
+    if controls.right:
+        player.turn_right()
+    if controls.up:
+        player.move_forward()
+    for _ in range(min(controls.shots, MAX_SHOTS)):
+        player.shoot()
+        player.points -= 2
+    for x, y in controls.spawns:
+        place_planet(x, y)
+
+    # Spawn planets
+    if len(planets) < MAX_PLANETS and game_rng.random() < 5/TICK_RATE*TIME_SCALE*TICK_SCALE:  # Expect number of planets = 5
+        planets.append(spawn_planet())
+    profiler.mark("spawn")
+
+    player.offscreen()
+    player.update(planets)
+    profiler.mark("player")
+    to_remove = set()  # Use a set to avoid duplicate removals
+
+    # Broad phase: only things sharing a grid cell with a planet get the exact circle test.
+    # With few planets and bullets, checking everything is cheaper than building the grid.
+    # Swept tests cover the whole movement of the player and bullets this tick, planets stand
+    # still until their own step below. Only something that moved further than its own radius
+    # can jump over a planet, anything slower gets the cheaper end of tick test
+    bullets = player.bullets
+    swept = COLLISIONS == "swept"
+    player_hits, bullet_hits = check_collision, bullets.hits
+    if swept:
+        if (player.x - player.prev_x)**2 + (player.y - player.prev_y)**2 > player.radius * player.radius:
+            player_hits = check_swept_collision
+        if bullets.speed * TICK_SCALE > bullets.radius:
+            bullet_hits = bullets.sweep_hits
+    use_grid = len(planets) * (len(bullets) + 1) >= BROAD_PHASE_MIN_PAIRS
+    if use_grid:
+        collision_grid.clear(planet_cell_size(planets))
+        for planet in planets:
+            collision_grid.insert(planet, planet.x, planet.y, planet.radius)
+        if swept:
+            collision_grid.insert(player, *swept_circle(player.prev_x, player.prev_y, player.x, player.y, player.radius))
+            for j in range(bullets.count):
+                collision_grid.insert(j, *swept_circle(bullets.prev_x[j], bullets.prev_y[j], bullets.x[j], bullets.y[j],
+                                                       bullets.radius))
+        else:
+            collision_grid.insert(player, player.x, player.y, player.radius)
+            for j in range(bullets.count):
+                collision_grid.insert(j, bullets.x[j], bullets.y[j], bullets.radius)  # Bullets go in by slot number
+    spent_bullets = False
+
+    for i, planet in enumerate(planets):
+        if use_grid:
+            nearby = collision_grid.query(planet.x, planet.y, planet.radius)
+            player_nearby = player in nearby
+            nearby_bullets = [item for item in nearby if type(item) is int]
+        else:
+            player_nearby = True
+            nearby_bullets = range(bullets.count)
+        if player.points <= 0:
+            return "points"
+        if player_nearby and player_hits(player, planet):
+            return "collision"
+        for j in nearby_bullets:
+            if bullets.alive[j] and bullet_hits(j, planet):
+                bullets.alive[j] = False
+                spent_bullets = True
+                new_planets = planet.split(bullets.angle[j], bullets.speed)  # Split the planet into smaller pieces
+                player.splits += 1
+                to_remove.add(i)  # Remove the original planet
+                planets.extend(new_planets)  # Add the new planets to the list
+                if use_grid:
+                    for new_planet in new_planets:
+                        collision_grid.insert(new_planet, new_planet.x, new_planet.y, new_planet.radius)
+                player.points += 10
+                break  # One hit per planet per tick, the planet is gone
+    if spent_bullets:
+        bullets.remove_spent()
+    profiler.mark("collisions")
+
+    # Planet-planet gravity, merges and movement. Leapfrog drifts the planets half a tick first,
+    # the step then kicks them with the forces there and drifts the other half. The adaptive
+    # integrator only applies to the player and the preview, planets use leapfrog with it
+    time_scale = TIME_SCALE * TICK_SCALE
+    if INTEGRATOR == "euler":
+        step_planets(planets, to_remove, time_scale)
+    else:
+        for i, planet in enumerate(planets):
+            if i not in to_remove:
+                planet.update_position(time_scale / 2)
+        step_planets(planets, to_remove, time_scale / 2)
+    if swept:
+        sweep_planets(planets, to_remove, time_scale)
+    profiler.mark("gravity")
+    if controls.left or controls.up or controls.right:
+        if not thrusting:
+            thrusting_sound.play(loops=-1)
+            thrusting = True
+    else:
+        if thrusting:
+            thrusting_sound.stop()
+            thrusting = False
+
+    # Remove collided or off-screen planets
+    if to_remove:
+        remove_planets(planets, to_remove)
+    return None
+
+class Snapshot:
+    # What the renderer needs from one tick of a SimulationThread. It is built from the live game
+    # right after the tick and never changed once it is published. Planets are (x, y, prev_x,
+    # prev_y, radius, color, glow_texture, handle) and bullets (x, y, prev_x, prev_y)
+    __slots__ = ("due", "planets", "bullets", "bullet_radius", "player", "points", "trajectory", "hit",
+                 "stats", "death")
+
+    def __init__(self, due, death=None):
+        self.due = due  # When the tick was due, frames interpolate towards the next one from here
+        self.planets = tuple((planet.x, planet.y, planet.prev_x, planet.prev_y, planet.radius, planet.color,
+                              planet.glow_texture, planet_pool.handle(planet)) for planet in planets)
+        bullets = player.bullets
+        self.bullets = tuple(zip(bullets.x[:bullets.count], bullets.y[:bullets.count],
+                                 bullets.prev_x[:bullets.count], bullets.prev_y[:bullets.count]))
+        self.bullet_radius = bullets.radius
+        self.player = (player.x, player.y, player.prev_x, player.prev_y, player.angle)
+        self.points = player.points
+        trajectory, self.hit = trajectory_predictor.predict(player, planets)
+        self.trajectory = tuple(trajectory)  # The predictor reuses its list on the next tick
+        self.stats = planet_stats(planet_pool.get(selected_handle))
+        self.death = death
+
+    def planet_at(self, x, y):
+        # Handle of the planet under a click, like Planet.is_clicked
+        for planet_x, planet_y, prev_x, prev_y, radius, color, glow_texture, handle in self.planets:
+            if (x - planet_x) ** 2 + (y - planet_y) ** 2 <= radius ** 2:
+                return handle
+        return None
+
+class SimulationThread:
+    # --pipeline: physics, collisions and scoring run on this thread every PHYSICS_DT while the
+    # main thread only handles events and draws. Controls arrive through the inputs queue and
+    # add up until the next tick. Every tick builds a new Snapshot and publishes it by replacing
+    # front, the renderer draws the one it last read while the next is built, so neither side
+    # waits on a lock for the other. After a death the thread waits until the main thread has
+    # shown the death screen and calls resume(), nothing else touches the game while it runs.
+    # Pygame lets go of the GIL while it blits and presents, the Python parts of the physics and
+    # of drawing still take turns
+    def __init__(self, recorder=None, replay=None, script=None):
+        self.inputs = queue.Queue()
+        self.recorder = recorder
+        self.replay = replay
+        self.script = script  # InputScript used instead of the queue, for the pipeline benchmark
+        self.paused = False
+        self.running = False
+        self.finished = False  # The replay has run out
+        self.error = None
+        self.resumed = threading.Event()
+        self.thread = None
+        self.ticks = 0
+        self.front = None
+
+    def start(self):
+        self.front = Snapshot(time.perf_counter())
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.resumed.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def resume(self):
+        # After a death, once the main thread has restarted the game
+        self.front = Snapshot(time.perf_counter())
+        self.resumed.set()
+
+    def alpha(self, snapshot):
+        if self.paused:
+            return 1.0
+        return min(1.0, max(0.0, (time.perf_counter() - snapshot.due) / PHYSICS_DT))
+
+    def merge(self, controls, update):
+        # Held keys from the latest input, shots and right clicks wait for the next tick
+        controls.left, controls.right, controls.up = update.left, update.right, update.up
+        controls.shots += update.shots
+        controls.spawns.extend(update.spawns)
+
+    def run(self):
+        try:
+            self.loop()
+        except Exception as error:
+            self.error = error  # Raised again on the main thread
+
+    def loop(self):
+        controls = Controls()
+        due = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            if self.paused:
+                due = now + PHYSICS_DT
+            if now < due:
+                try:
+                    self.merge(controls, self.inputs.get(timeout=due - now))
+                except queue.Empty:
+                    pass
+                if self.paused and controls.spawns and not self.replay:
+                    # Right clicks while paused place their planet straight away
+                    for x, y in controls.spawns:
+                        place_planet(x, y)
+                        if self.recorder:
+                            self.recorder.place(x, y)
+                    controls.spawns = []
+                    self.front = Snapshot(now)
+                continue
+            while not self.inputs.empty():
+                self.merge(controls, self.inputs.get_nowait())
+            if self.script:
+                controls = self.script.controls(self.ticks)
+            death = None
+            if self.replay:
+                if self.replay.finished():
+                    self.finished = True
+                    return
+                self.replay.step()  # Deaths restart on their own, like they did while recording
+            else:
+                if self.recorder:
+                    self.recorder.record(controls)
+                death = simulate_tick(controls)
+            controls = controls.next_tick()
+            self.ticks += 1
+            if death:
+                self.resumed.clear()
+                self.front = Snapshot(due, death)
+                self.resumed.wait()
+                if not self.running:
+                    return  # Quit from the death screen, the recording ends on the death
+                due = time.perf_counter()
+            else:
+                self.front = Snapshot(due)
+                due += PHYSICS_DT
+                if time.perf_counter() - due > MAX_SUBSTEPS * PHYSICS_DT:
+                    due = time.perf_counter()  # Too far behind, let the simulation slow down instead
+            if self.recorder:
+                self.recorder.end_tick()
+
+class InputScript:
+    # Scripted input for headless runs. Each line is a tick count followed by the actions for
+    # those ticks: left, right and up are held for every tick, shoot fires once on the first
+    # tick and "spawn X Y" right clicks at X, Y on the first tick. The script loops.
+    #   40 up
+    #   20 left shoot
+    DEMO = ["40 up", "25 left shoot", "30", "15 right up", "20 shoot", "60"]
+
+    def __init__(self, lines=None):
+        self.segments = []
+        for line in lines if lines is not None else self.DEMO:
+            words = line.split("#")[0].split()
+            if not words:
+                continue
+            count, words = int(words[0]), words[1:]
+            held = {word for word in words if word in ("left", "right", "up")}
+            spawns = []
+            if "spawn" in words:
+                at = words.index("spawn")
+                spawns.append((int(words[at + 1]), int(words[at + 2])))
+            self.segments.append((count, held, "shoot" in words, spawns))
+        self.length = sum(segment[0] for segment in self.segments)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls(f.read().splitlines())
+
+    def controls(self, tick):
+        tick %= self.length
+        for count, held, shoot, spawns in self.segments:
+            if tick < count:
+                first = tick == 0
+                return Controls("left" in held, "right" in held, "up" in held,
+                                1 if shoot and first else 0, list(spawns) if first else [])
+            tick -= count
+
+def run_headless(ticks, seed=0, script=None, recorder=None):
+    # Simulate as fast as possible, restarting after each death like pressing R
+    game_rng.seed(seed)
+    script = script or InputScript()
+    reset_game()
+    if recorder:
+        recorder.start(seed)
+    deaths = 0
+    best = player.points
+    started = time.perf_counter()
+    for tick in range(ticks):
+        controls = script.controls(tick)
+        if recorder:
+            recorder.record(controls)
+        if simulate_tick(controls):
+            deaths += 1
+            reset_game()
+        if recorder:
+            recorder.end_tick()
+        best = max(best, player.points)
+    elapsed = time.perf_counter() - started
+    print(f"{ticks} ticks ({ticks * PHYSICS_DT:.0f}s of game time) in {elapsed:.2f}s: "
+          f"{ticks / elapsed:.0f} ticks/s, {deaths} deaths, best points {best}")
+    return ticks / elapsed
+
+KEYFRAME_INTERVAL = TICK_RATE * 30  # A full state snapshot every 30 seconds of game time
+
+def capture_state():
+    # Everything the simulation depends on, as plain JSON-friendly values
+    bullets = player.bullets
+    return {
+        "rng": game_rng.getstate(),
+        "player": [player.x, player.y, player.angle, player.vx, player.vy, player.points, player.mass,
+                   [[bullets.x[j], bullets.y[j], bullets.angle[j]] for j in range(bullets.count)]],
+        "planets": [[planet.x, planet.y, planet.mass, planet.velocity, planet.radius, planet.color, planet.name]
+                    for planet in planets],
+    }
+
+def restore_state(state):
+    global player, planets
+    version, internal, gauss_next = state["rng"]
+    game_rng.setstate((version, tuple(internal), gauss_next))
+    x, y, angle, vx, vy, points, mass, bullets = state["player"]
+    player = Player(x, y, angle, 15)
+    player.vx, player.vy, player.points, player.mass = vx, vy, points, mass
+    for x, y, angle in bullets:
+        player.bullets.add(x, y, angle)
+    for planet in planets:
+        planet_pool.release(planet)
+    # Name and radius are passed in, otherwise a new name would be drawn from game_rng
+    planets = [planet_pool.new(x, y, mass, velocity, tuple(color), name, radius)
+               for x, y, mass, velocity, radius, color, name in state["planets"]]
+
+class ReplayRecorder:
+    # Records a session as seed + per-tick input, with a state keyframe every keyframe_interval
+    # ticks. Call record() with the controls right before simulate_tick and end_tick() once the
+    # tick is over, including the restart after a death
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.seed = None
+        self.ticks = 0
+        self.inputs = bytearray()
+        self.keyframes = []
+        self.placed = []
+        self.pending = False  # A tick was recorded but not finished, e.g. quit on the death screen
+
+    def start(self, seed):
+        self.seed = seed
+        self.keyframes.append((0, 0, capture_state()))
+
+    def place(self, x, y):
+        # A right click while paused, the planet appears before the next tick
+        self.placed.append((x, y))
+
+    def record(self, controls):
+        self.inputs += encode_tick(controls, self.placed)
+        self.placed = []
+        self.pending = True
+
+    def end_tick(self):
+        self.pending = False
+        self.ticks += 1
+        if self.ticks % self.keyframe_interval == 0:
+            self.keyframes.append((self.ticks, len(self.inputs), capture_state()))
+
+    def save(self, path):
+        if self.seed is None:
+            return  # Quit before the first game started, there is nothing to save
+        write_replay(path, {
+            "seed": self.seed,
+            "ticks": self.ticks + (1 if self.pending else 0),
+            "ended_on_death": self.pending,
+            "physics": PHYSICS_BACKEND,
+            "theta": BARNES_HUT_THETA,
+            "max_planets": MAX_PLANETS,
+            "collisions": COLLISIONS,
+            "integrator": INTEGRATOR,
+            "physics_rate": round(TICK_RATE / TICK_SCALE),
+            "final": capture_state(),
+        }, self.inputs, self.keyframes)
+
+class Replay:
+    def __init__(self, header, inputs, keyframes):
+        self.header = header
+        self.seed = header["seed"]
+        self.ticks = header["ticks"]
+        self.inputs = inputs
+        self.keyframes = keyframes
+        self.offset = 0
+        self.tick = 0
+
+    @classmethod
+    def load(cls, path):
+        return cls(*read_replay(path))
+
+    def apply_settings(self):
+        # The physics backend changes results, so play back with the one that recorded
+        global PHYSICS_BACKEND, BARNES_HUT_THETA, MAX_PLANETS, COLLISIONS, INTEGRATOR, PHYSICS_DT, TICK_SCALE
+        PHYSICS_BACKEND = self.header["physics"]
+        BARNES_HUT_THETA = self.header["theta"]
+        MAX_PLANETS = self.header["max_planets"]
+        COLLISIONS = self.header.get("collisions", "discrete")  # Replays from before swept collisions
+        INTEGRATOR = self.header.get("integrator", "euler")
+        physics_rate = self.header.get("physics_rate", TICK_RATE)
+        PHYSICS_DT = 1 / physics_rate
+        TICK_SCALE = TICK_RATE / physics_rate
+
+    def seek(self, tick):
+        # Restore the closest keyframe at or before tick and simulate the rest of the way
+        tick = max(0, min(tick, self.ticks))
+        keyframe_tick, offset, state = max((keyframe for keyframe in self.keyframes if keyframe[0] <= tick),
+                                           key=lambda keyframe: keyframe[0])
+        restore_state(state)
+        self.tick, self.offset = keyframe_tick, offset
+        while self.tick < tick:
+            self.step()
+
+    def step(self):
+        # Simulate the next recorded tick, returns the cause of death like simulate_tick
+        buttons, placed, self.offset = decode_tick(self.inputs, self.offset)
+        controls = Controls(*buttons)
+        for x, y in placed:
+            place_planet(x, y)
+        death = simulate_tick(controls)
+        self.tick += 1
+        if death and not (self.finished() and self.header["ended_on_death"]):
+            reset_game()  # The recording continued after a restart
+        return death
+
+    def finished(self):
+        return self.tick >= self.ticks
+
+def fast_forward(replay, start=0):
+    # Re-simulate a replay without rendering and check it ends in the recorded state
+    replay.apply_settings()
+    started = time.perf_counter()
+    replay.seek(start)
+    deaths = 0
+    while not replay.finished():
+        if replay.step():
+            deaths += 1
+    elapsed = time.perf_counter() - started
+    matches = json.loads(json.dumps(capture_state())) == replay.header["final"]
+    print(f"Replayed ticks {start}-{replay.ticks} ({(replay.ticks - start) * PHYSICS_DT:.0f}s of game time) "
+          f"in {elapsed:.3f}s, {deaths} deaths, final points {player.points}, "
+          f"{'matches' if matches else 'DOES NOT match'} the recording")
+    return matches
+
 def show_title_screen():
     clock = pygame.time.Clock()
     angle_alpha = 0
@@ -589,8 +2216,10 @@ def show_title_screen():
             x = center_x + int(radius * 2 * math.cos(orbital_angle))
             y = center_y + int(radius * 2 * math.sin(orbital_angle))
             pygame.draw.circle(screen, (0, 255, 255), (x, y), 10)  # Smaller orbiting circles
-    global settings 
-    settings = load_settings(screen)       
+    # Decode the sound effects and the first music tier while the title screen is up
+    assets.preload([sound.path for sound in (shoot_sound, explosion_sound, thrusting_sound, delta_sound)] +
+                   [music_tracks["low"]])
+    load_settings(screen)
     music_slider.set_value(settings["music_volume"])
     sfx_slider.set_value(settings["sfx_volume"])
     
@@ -603,41 +2232,39 @@ def show_title_screen():
         draw_orbiting_circles(50)
 
         # Game title and objective
-        font = pygame.font.SysFont("arial", 68)
-        title_text = font.render("Planet Breaker", True, (255, 255, 255))
+        title_text = text_renderer.render("Planet Breaker", (255, 255, 255), 68, "arial", system=True)
         title_text_rect = title_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 110))
         screen.blit(title_text, title_text_rect)
 
-        objective_font = pygame.font.Font(None, 50)
-        objective_text = objective_font.render("Break planets. Avoid collisions.", True, (255, 255, 255))
+        objective_text = text_renderer.render("Break planets. Avoid collisions.", (255, 255, 255), 50)
         objective_text_rect = objective_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 - 40))
         screen.blit(objective_text, objective_text_rect)
 
         # Controls
-        controls_font = pygame.font.Font(None, 36)
         controls_text = [
             "Thrust: Up | Turn: Left/Right",
             "Pause: K | Shoot: Space",
         ]
         for i, line in enumerate(controls_text):
-            line_text = controls_font.render(line, True, (200, 200, 200))
+            line_text = text_renderer.render(line, (200, 200, 200), 36)
             line_text_rect = line_text.get_rect(center=(WIDTH // 2, HEIGHT // 2 + 20 + (i * 30)))
             screen.blit(line_text, line_text_rect)
 
         # Start instructions
-        def pulsating_text(text, font, color, center, frame):
+        def pulsating_text(text, size, color, center, frame):
             """Draw pulsating text on the screen."""
             alpha = abs((frame % 100) - 50) * 5  # Pulsating effect
-            text_surface = font.render(text, True, color)
+            text_surface = text_renderer.render(text, color, size)
             text_surface.set_alpha(alpha)
             text_rect = text_surface.get_rect(center=center)
             screen.blit(text_surface, text_rect)
         
         
-        pulsating_text("Press Enter to start or Q to quit", pygame.font.Font(None, 36), (255, 255, 255), (WIDTH // 2, HEIGHT // 2 + 200), frame)
+        pulsating_text("Press Enter to start or Q to quit", 36, (255, 255, 255), (WIDTH // 2, HEIGHT // 2 + 200), frame)
         frame += 1
 
         pygame.display.flip()
+        startup_mark("first frame")
         clock.tick(60)
 
         # Rotate circles
@@ -656,21 +2283,29 @@ def show_title_screen():
                     return "quit"
                 
 def draw_gradient_background():
-    for y in range(HEIGHT):
-        color = (
-            int(10 + y * 0.05),  # Red: starts at 10, increases slightly
-            int(10 + y * 0.05),  # Green: same as red for a smooth blend
-            int(30 + y * 0.1)    # Blue: starts darker, increases faster
-        )
-        pygame.draw.line(screen, color, (0, y), (WIDTH, y))
+    global TITLE_BACKGROUND
+    if TITLE_BACKGROUND is None:
+        # One pixel wide column of the gradient, stretched to the screen width once
+        column = pygame.Surface((1, HEIGHT))
+        for y in range(HEIGHT):
+            color = (
+                int(10 + y * 0.05),  # Red: starts at 10, increases slightly
+                int(10 + y * 0.05),  # Green: same as red for a smooth blend
+                int(30 + y * 0.1)    # Blue: starts darker, increases faster
+            )
+            column.set_at((0, y), color)
+        TITLE_BACKGROUND = pygame.transform.scale(column, (WIDTH, HEIGHT))
+    screen.blit(TITLE_BACKGROUND, (0, 0))
         
-def gradient_and_music():
-    global GRADIENT_CACHED
+def gradient_and_music(points):
+    global BACKGROUND_COLOR
 
-    player_points = player.points
-    update_music(player_points)
+    update_music(points)
+    BACKGROUND_COLOR = gradient_color(points)
 
-    GRADIENT_CACHED = pygame.Surface((WIDTH, HEIGHT))
+def gradient_color(player_points):
+    # The background colour only depends on the score and is the same on every row, so the
+    # background is filled with it every frame instead of being kept as a screen sized surface
     thresholds = [0, 50, 100, 150]  # Black at 0, Blue at 50, Green at 100, Red at 150+
     colors = [
         (0, 0, 0),      # Black (0 points)
@@ -692,242 +2327,374 @@ def gradient_and_music():
                 t = (player_points - thresholds[i]) / (thresholds[i + 1] - thresholds[i])
                 break
 
-    for y in range(HEIGHT):
-        red = int(color_start[0] + (color_end[0] - color_start[0]) * t)
-        green = int(color_start[1] + (color_end[1] - color_start[1]) * t)
-        blue = int(color_start[2] + (color_end[2] - color_start[2]) * t)
-        color = (red, green, blue)
-
-        pygame.draw.line(GRADIENT_CACHED, color, (0, y), (WIDTH, y))
+    red = int(color_start[0] + (color_end[0] - color_start[0]) * t)
+    green = int(color_start[1] + (color_end[1] - color_start[1]) * t)
+    blue = int(color_start[2] + (color_end[2] - color_start[2]) * t)
+    return (red, green, blue)
         
-def draw_trajectory(screen, player, planets, steps=60, dt=0.5, color=(0, 255, 0)):
-    trajectory_points, hit = predict_trajectory(player, planets, steps, dt)
+points_panel = None
+stats_panel = None
 
-    # Draw trajectory line with dots spaced every few points for clarity
-    if hit:
-        color =(255, 0, 0)
-    
-    for i in range(1, len(trajectory_points)):
-        pygame.draw.line(screen, color, trajectory_points[i - 1], trajectory_points[i], 1)
-
-    # Draw hollow ghost player at last predicted point
-    if trajectory_points:
-        ghost_x, ghost_y = trajectory_points[-1]
-        rad_angle = math.radians(player.angle)
-
-        front_x = ghost_x + 20 * math.cos(rad_angle)
-        front_y = ghost_y - 20 * math.sin(rad_angle)
-        left_x = ghost_x + 10 * math.cos(rad_angle + math.pi / 2)
-        left_y = ghost_y - 10 * math.sin(rad_angle + math.pi / 2)
-        right_x = ghost_x + 10 * math.cos(rad_angle - math.pi / 2)
-        right_y = ghost_y - 10 * math.sin(rad_angle - math.pi / 2)
-        pygame.draw.polygon(screen, color, [(front_x, front_y), (left_x, left_y), (right_x, right_y)], width=1)
+def draw_hud_panels(screen, points, stats):
+    global points_panel, stats_panel
+    if points_panel is None:
+        points_panel = HudPanel(170, 70)
+        stats_panel = HudPanel(320, 130)
+    rects = [points_panel.draw(screen, (0, 0), [f"Points: {points:.0f}"])]
 
-        
-# Simulation setup
-show_title_screen()
+    # If a planet is selected, display its stats
+    if stats:
+        rects.append(stats_panel.draw(screen, (WIDTH - 320, 0), stats))
+    return rects
+
+def planet_stats(selected_planet):
+    # The lines of the selected planet's stats panel, None without a selection
+    if not selected_planet:
+        return None
+    return [
+        f"Name: {selected_planet.name}",
+        f"Mass: {selected_planet.mass:.2f}kg",
+        f"Velocity: ({selected_planet.velocity[0]:.2f}, {selected_planet.velocity[1]:.2f})",
+        f"Momentum: ({selected_planet.velocity[0]/selected_planet.mass:.2f}, {selected_planet.velocity[1]/selected_planet.mass:.2f})",
+    ]
+
+class DrawList:
+    # The world for one frame, queued in world coordinates and drawn in the order it was queued.
+    # Sprites from sprite_cache queued back to back go out in one Surface.blits() call and each
+    # polyline is one pygame.draw.lines() call, so a frame of planets, the trajectory, then the
+    # ghost, ship and bullets takes three calls. calls counts the draw calls made so far
+    def __init__(self):
+        self.layers = []  # Sprite lists and (color, points) polylines
+        self.sprites = []
+        self.calls = 0
+
+    def planet(self, x, y, radius, color, glow_texture):
+        sprite = sprite_cache.planet(glow_texture, color, radius)
+        half = sprite.get_width() // 2
+        self.sprites.append((sprite, (round(x * RENDER_SCALE) - half, round(y * RENDER_SCALE) - half)))
+
+    def ship(self, x, y, angle, color=(255, 255, 255), width=0):
+        sprite = sprite_cache.ship(angle, color, width)
+        half = sprite.get_width() // 2
+        self.sprites.append((sprite, (round(x * RENDER_SCALE) - half, round(y * RENDER_SCALE) - half)))
+
+    def bullets(self, bullets, radius, alpha=1.0):
+        # bullets are (x, y, prev_x, prev_y)
+        sprite = sprite_cache.bullet(radius)
+        r = sprite.get_width() // 2
+        scale = RENDER_SCALE
+        self.sprites.extend((sprite, (int((px + (x - px) * alpha) * scale) - r, int((py + (y - py) * alpha) * scale) - r))
+                            for x, y, px, py in bullets)
+
+    def path(self, trajectory_points, hit, angle):
+        # The trajectory preview and the hollow ghost at its end, red when it runs into a planet
+        color = (255, 0, 0) if hit else (0, 255, 0)
+        if len(trajectory_points) > 1:
+            scale = RENDER_SCALE
+            self.flush()
+            self.layers.append((color, [(x * scale, y * scale) for x, y in trajectory_points] if scale != 1
+                                       else trajectory_points))
+        if trajectory_points:
+            self.ship(*trajectory_points[-1], angle, color, width=1)
+
+    def flush(self):
+        # Close the current run of sprites, whatever is queued next goes on top of them
+        if self.sprites:
+            self.layers.append(self.sprites)
+            self.sprites = []
+
+    def draw(self, target):
+        self.flush()
+        rects = []
+        for layer in self.layers:
+            if type(layer) is list:
+                rects.extend(target.blits(layer))
+            else:
+                color, points = layer
+                rects.append(pygame.draw.lines(target, color, False, points, 1))
+        self.calls += len(self.layers)
+        self.layers.clear()
+        return rects
+
+draw_list = DrawList()
+
+def draw_world(alpha):
+    # Everything drawn over the background during play, returns the rects that were touched.
+    # The world is queued on draw_list and drawn in one batch, that cost shows up as draw_player
+    for planet in planets:
+        x, y = interpolate(planet, alpha)
+        draw_list.planet(x, y, planet.radius, planet.color, planet.glow_texture)
+    profiler.mark("draw_planets")
+    draw_list.path(*trajectory_predictor.predict(player, planets), player.angle)
+    profiler.mark("trajectory")
+    draw_list.ship(*interpolate(player, alpha), player.angle)
+    bullets = player.bullets
+    draw_list.bullets(zip(bullets.x[:bullets.count], bullets.y[:bullets.count],
+                          bullets.prev_x[:bullets.count], bullets.prev_y[:bullets.count]), bullets.radius, alpha)
+    return draw_overlay(draw_list.draw(world_surface), player.points, planet_stats(planet_pool.get(selected_handle)))
+
+def draw_snapshot(snapshot, alpha):
+    # draw_world for --pipeline, everything comes from the snapshot instead of the live game
+    for x, y, prev_x, prev_y, radius, color, glow_texture, handle in snapshot.planets:
+        draw_list.planet(prev_x + (x - prev_x) * alpha, prev_y + (y - prev_y) * alpha, radius, color, glow_texture)
+    profiler.mark("draw_planets")
+    x, y, prev_x, prev_y, angle = snapshot.player
+    draw_list.path(snapshot.trajectory, snapshot.hit, angle)
+    profiler.mark("trajectory")
+    draw_list.ship(prev_x + (x - prev_x) * alpha, prev_y + (y - prev_y) * alpha, angle)
+    draw_list.bullets(snapshot.bullets, snapshot.bullet_radius, alpha)
+    return draw_overlay(draw_list.draw(world_surface), snapshot.points, snapshot.stats)
+
+def draw_overlay(rects, points, stats):
+    # Finishes a frame once the world is drawn: the pause veil, the scaled copy and the HUD
+    global pause_overlay
+    profiler.mark("draw_player")
+    if paused:
+        # Semi-transparent overlay, at the render resolution like the rest of the world
+        if pause_overlay is None or pause_overlay.get_size() != world_surface.get_size():
+            pause_overlay = pygame.Surface(world_surface.get_size(), pygame.SRCALPHA)
+            pause_overlay.fill((0, 0, 0, 180))
+        rects.append(world_surface.blit(pause_overlay, (0, 0)))
+    if world_surface is not screen:
+        # One scaled copy to the window, the whole window changes every frame
+        pygame.transform.scale(world_surface, screen.get_size(), screen)
+        rects = [screen.get_rect()]
+    rects.extend(draw_hud_panels(screen, points, stats))
+    profiler.mark("hud")
+    return rects
+
+# Simulation state
+player = None
 planets = []
-selected_planet = None
+selected_handle = None  # planet_pool handle of the planet whose stats are shown
 paused = False  # Add paused variable to control simulation state
-player = Player(WIDTH // 2, HEIGHT // 2, 0, 15)
-
-
-# Main loop
-running = True
-while running:
-    if player.points != POINTS_PREV:
-        POINTS_PREV = player.points
-        player.mass = (player.points)/5**2
-        gradient_and_music()
-    screen.blit(GRADIENT_CACHED, (0, 0))
-
-    if not paused:
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
-            player.turn_left()
-        if keys[pygame.K_RIGHT]:
-            player.turn_right()
-        if keys[pygame.K_UP]:
-            player.move_forward()
+collision_grid = SpatialHash()
+pause_overlay = None
+trajectory_predictor = TrajectoryPredictor(PREDICTION_STEPS, PREDICTION_DT)
+frame_rects = DirtyRects(False)
+
+def main(argv=None):
+    global player, selected_handle, paused, frame_rects, trajectory_predictor, POINTS_PREV
+    configure(parser.parse_args(argv))
+    trajectory_predictor = TrajectoryPredictor(PREDICTION_STEPS, PREDICTION_DT)
+    startup_mark("import")
+    init_display()
+    startup_mark("display")
+    atexit.register(settings.flush)
+    if ARGS.glow_stats:
+        atexit.register(lambda: print("Glow cache:", glow_cache.stats()))
+    if ARGS.gc_stats:
+        gc.callbacks.append(gc_stats.callback)
+        atexit.register(lambda: print("Garbage collection:", gc_stats.stats()))
+    if ARGS.profile_log:
+        profiler.start_log(ARGS.profile_log)
+    if ARGS.profile:
+        profiler.toggle()
+
+    # Simulation setup
+    frame_rects = DirtyRects(ARGS.renderer == "dirty")
+    recorder = ReplayRecorder() if ARGS.record else None
+    if recorder:
+        atexit.register(lambda: recorder.save(ARGS.record))
+    replay = Replay.load(ARGS.replay) if ARGS.replay else None
+    if HEADLESS and replay:
+        fast_forward(replay, ARGS.seek)
+        sys.exit()
+    if HEADLESS:
+        run_headless(ARGS.ticks, ARGS.seed or 0, InputScript.load(ARGS.script) if ARGS.script else None, recorder)
+        sys.exit()
+    if show_title_screen() == "quit":
+        return
+    player = Player(WIDTH // 2, HEIGHT // 2, 0, 15)
+    if replay:
+        replay.apply_settings()
+        trajectory_predictor = TrajectoryPredictor(PREDICTION_STEPS, PREDICTION_DT)  # For the recorded rate
+        replay.seek(ARGS.seek)
+    else:
+        seed = ARGS.seed if ARGS.seed is not None else random.randrange(2**32)
+        game_rng.seed(seed)
+        reset_game()
+        if recorder:
+            recorder.start(seed)
+
+
+    # Main loop: physics runs in fixed PHYSICS_DT ticks from an accumulator of real time, rendering
+    # runs as often as FPS_LIMIT allows and interpolates between the last two ticks. With
+    # --pipeline the ticks run on a SimulationThread instead and the loop draws its snapshots
+    running = True
+    controls = Controls()  # Shots and clicks wait here until a physics tick consumes them
+    accumulator = 0.0
+    previous_time = time.perf_counter()
+    sim = SimulationThread(recorder, replay) if ARGS.pipeline else None
+    if sim:
+        sim.start()
+    while running:
+        profiler.start_frame()
+        now = time.perf_counter()
+        accumulator += min(now - previous_time, MAX_SUBSTEPS * PHYSICS_DT)
+        previous_time = now
+        if sim:
+            if sim.error:
+                raise sim.error
+            snapshot = sim.front
+            points = snapshot.points
+        else:
+            points = player.points
+
+        if points != POINTS_PREV:
+            POINTS_PREV = points
+            background = BACKGROUND_COLOR
+            gradient_and_music(points)
+            if BACKGROUND_COLOR != background:
+                frame_rects.invalidate()
+        switch_music()
+        frame_rects.restore(world_surface, BACKGROUND_COLOR)
+        profiler.mark("background")
+
+        if not paused:
+            keys = pygame.key.get_pressed()
+            controls.left = keys[pygame.K_LEFT]
+            controls.right = keys[pygame.K_RIGHT]
+            controls.up = keys[pygame.K_UP]
     
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        # Toggle pause state with the 'P' key
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_SPACE and not paused:
-                player.shoot()
-                player.points -= 2
-            if event.key == pygame.K_p:
-                paused = not paused  # Toggle pause state
-            if event.key == pygame.K_q:  # Quit
-                pygame.quit()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-                sys.exit()
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-
-            if event.button == 1:  # Left mouse button (for checking planets)
-                # Check if the player clicked on a planet
-                planet_clicked = False
-                for planet in planets:
-                    if planet.is_clicked(mouse_x, mouse_y):
-                        selected_planet = planet
-                        planet_clicked = True
-                        break
-                if not planet_clicked:
-                    selected_planet = None  # Deselect any selected planet
-
-            elif event.button == 3:  # Right mouse button (for creating a new planet)
-                # If the player clicked on empty space, create a new planet
-                if is_space_empty(mouse_x, mouse_y, planets):
-                    planets.append(spawn_planet(mouse_x, mouse_y))
-                else:
-                    print("Clicked too close to an existing planet")
-
-    # Spawn planets
-    if not paused and len(planets) < MAX_PLANETS and random.random() < 5/TICK_RATE*TIME_SCALE:  # Expect number of planets = 5
-        planets.append(spawn_planet())
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                frame_rects.invalidate()
+            # Toggle pause state with the 'P' key
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE and not paused:
+                    controls.shots += 1
+                if event.key == pygame.K_p:
+                    paused = not paused  # Toggle pause state
+                if event.key == pygame.K_F3:
+                    profiler.toggle()
+                if event.key == pygame.K_q:  # Quit
+                    if sim:
+                        sim.stop()
+                    pygame.quit()
+                    running = False
+                    sys.exit()
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+
+                if event.button == 1 and sim:
+                    selected_handle = snapshot.planet_at(mouse_x, mouse_y)
+                elif event.button == 1:  # Left mouse button (for checking planets)
+                    # Check if the player clicked on a planet
+                    planet_clicked = False
+                    for planet in planets:
+                        if planet.is_clicked(mouse_x, mouse_y):
+                            selected_handle = planet_pool.handle(planet)
+                            planet_clicked = True
+                            break
+                    if not planet_clicked:
+                        selected_handle = None  # Deselect any selected planet
+
+                elif event.button == 3 and not replay:  # Right mouse button (for creating a new planet)
+                    if paused and not sim:
+                        place_planet(mouse_x, mouse_y)
+                        if recorder:
+                            recorder.place(mouse_x, mouse_y)
+                    else:
+                        controls.spawns.append((mouse_x, mouse_y))
 
+        profiler.mark("input")
 
-    # Update planets if not paused
-    if not paused: 
-        player.offscreen()
-        player.update(planets)        
-        to_remove = set()  # Use a set to avoid duplicate removals
-        for i, planet in enumerate(planets):
-            if check_collision(player, planet) or player.points <= 0:
-                if show_death_screen() == "restart":
+        # Update the simulation if not paused
+        if sim:
+            # The thread ticks on its own, it only gets this frame's input and pause state
+            sim.paused = paused
+            sim.inputs.put(controls)
+            controls = Controls(controls.left, controls.right, controls.up)
+            if sim.finished:
+                running = False
+            elif snapshot.death:
+                if show_death_screen(snapshot.death) == "restart":
                     reset_game()
+                    frame_rects.invalidate()
+                    sim.resume()
+                    snapshot = sim.front
                 else:
+                    sim.stop()
                     pygame.quit()
                     sys.exit()
-            for a, bullet in enumerate(player.bullets):
-                if check_collision(bullet, planet):
-                    del player.bullets[a]
-                    new_planets = planet.split(bullet)  # Split the planet into smaller pieces
-                    to_remove.add(i)  # Remove the original planet
-                    planets.extend(new_planets)  # Add the new planets to the list
-                    player.points += 10
-            
-            if i in to_remove:
-                continue  # Skip already removed planets
-            for j, other_planet in enumerate(planets):
-                if i != j and j not in to_remove:
-                    force = calculate_gravitational_force(planet, other_planet)
-                    if force is None:
-                        # Collision detected
-                        if planet.mass / other_planet.mass > 1.25 or planet.mass / other_planet.mass < 0.8:
-                            # Significant mass difference
-                            i_momentum = [planet.mass * planet.velocity[0], planet.mass * planet.velocity[1]]
-                            j_momentum = [other_planet.mass * other_planet.velocity[0], other_planet.mass * other_planet.velocity[1]]
-                            new_momentum = [i_momentum[0] + j_momentum[0], i_momentum[1] + j_momentum[1]]
-                            total_mass = planet.mass + other_planet.mass
-                            velocity = [new_momentum[0] / total_mass, new_momentum[1] / total_mass]
-
-                            if planet.mass > other_planet.mass:
-                                planet.mass = total_mass
-                                planet.velocity = velocity
-                                planet.radius = ((planet.mass ** (3 / 4)) * PLANET_RADIUS_SCALE)
-                                planet.glow_texture = create_glow_texture(int(planet.radius*3), planet.color, planet.mass)
-                                to_remove.add(j)  # Remove the smaller planet
-                            else:
-                                other_planet.mass = total_mass
-                                other_planet.velocity = velocity
-                                other_planet.radius = ((other_planet.mass ** (3 / 4)) * PLANET_RADIUS_SCALE)
-                                other_planet.glow_texture = create_glow_texture(int(other_planet.radius*3), other_planet.color, other_planet.mass)
-                                to_remove.add(i)  # Remove the current planet
-                            break
-                        else:
-                            to_remove.add(i)
-                            to_remove.add(j)
-                            break
-                    else:
-                        planet.velocity[0] += force[0] / planet.mass
-                        planet.velocity[1] += force[1] / planet.mass
-
-            if i not in to_remove:
-                planet.update_position(TIME_SCALE)  # Update position with time scale
-                if keys[pygame.K_LEFT] or keys[pygame.K_UP] or keys[pygame.K_RIGHT]: 
-                    if not thrusting:
-                        thrusting_sound.play(loops=-1)
-                        thrusting = True
+        if paused or sim:
+            accumulator = 0.0
+        substeps = 0
+        while not paused and not sim and accumulator >= PHYSICS_DT and substeps < MAX_SUBSTEPS:
+            accumulator -= PHYSICS_DT
+            substeps += 1
+            if replay:
+                if replay.finished():
+                    running = False
+                    break
+                replay.step()  # Deaths restart on their own, like they did while recording
+                continue
+            if recorder:
+                recorder.record(controls)
+            death = simulate_tick(controls)
+            controls = controls.next_tick()
+            if death:
+                if show_death_screen(death) == "restart":
+                    reset_game()
+                    frame_rects.invalidate()
+                    accumulator = 0.0
+                    previous_time = time.perf_counter()
                 else:
-                    if thrusting:
-                        thrusting_sound.stop()
-                        thrusting = False
-                if planet.is_offscreen():
-                    to_remove.add(i)
-
-        # Remove collided or off-screen planets
-        planets = [planet for i, planet in enumerate(planets) if i not in to_remove]
-
-    # Draw planets
-    for planet in planets:
-        planet.draw()
-    draw_trajectory(screen, player, planets)
-    player.draw(screen)
-
-    points_window = pygame.Surface((170, 70), pygame.SRCALPHA)
-    points_window.fill(TRANSLUCENT_WHITE)
-    points_font = pygame.font.Font(None, 36)
-    points_text = points_font.render(f"Points: {player.points:.0f}", True, TEXT_COLOR)
-
-    points_window.blit(points_text, (10, 10))
-    screen.blit(points_window, (0, 0))  # Adjust (50, 50) for position
-
+                    pygame.quit()
+                    sys.exit()
+            if recorder:
+                recorder.end_tick()
+        if substeps == MAX_SUBSTEPS:
+            accumulator = min(accumulator, PHYSICS_DT)  # Too far behind, let the simulation slow down instead
+        if sim:
+            alpha = sim.alpha(snapshot)
+        else:
+            alpha = accumulator / PHYSICS_DT if not paused else 1.0
+        profiler.mark("simulation")
 
-    # If a planet is selected, display its stats
-    if selected_planet:
-        box_width = 320
-        stats_window = pygame.Surface((box_width, 130), pygame.SRCALPHA)
-        stats_window.fill(TRANSLUCENT_WHITE)
-
-        mass_text = pygame.font.Font(None, 36).render(f"Mass: {selected_planet.mass:.2f}kg", True, TEXT_COLOR)
-        velocity_text = pygame.font.Font(None, 36).render(f"Velocity: ({selected_planet.velocity[0]:.2f}, {selected_planet.velocity[1]:.2f})", True, TEXT_COLOR)
-        name_text = pygame.font.Font(None, 36).render(f"Name: {selected_planet.name}", True, TEXT_COLOR)
-        momentum_text = pygame.font.Font(None, 36).render(f"Momentum: ({selected_planet.velocity[0]/selected_planet.mass:.2f}, {selected_planet.velocity[1]/selected_planet.mass:.2f})", True, TEXT_COLOR)
-
-        stats_window.blit(name_text, (10, 10))
-        stats_window.blit(mass_text, (10, 40))
-        stats_window.blit(velocity_text, (10, 70))
-        stats_window.blit(momentum_text, (10, 100))
-
-        screen.blit(stats_window, (WIDTH - box_width, 0))
+        frame_rects.add(draw_snapshot(snapshot, alpha) if sim else draw_world(alpha))
         
-    if paused:
-        # Semi-transparent overlay
-        overlay = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        screen.blit(overlay, (0, 0))
-
-        # Draw title
-        font = pygame.font.SysFont(None, 64)
-        title_text = font.render("PAUSED: Press P", True, (255, 255, 255))
-        title_rect = title_text.get_rect(center=(WIDTH // 2, music_slider.rect.top - 60))
-        screen.blit(title_text, title_rect)
-
-        # Handle slider events
-        music_slider.handle_event(event)
-        sfx_slider.handle_event(event)
-
-        # Update music volume
-        current_channel.set_volume(music_slider.get_value())
-
-        # Draw sliders
-        music_slider.draw(screen)
-        sfx_slider.draw(screen)
-
-        # Draw labels
-        label_font = pygame.font.SysFont(None, 28)
-        music_label = label_font.render("Music Volume", True, (255, 255, 255))
-        sfx_label = label_font.render("SFX Volume", True, (255, 255, 255))
-
-        screen.blit(music_label, (music_slider.rect.x, music_slider.rect.y - 24))
-        screen.blit(sfx_label, (sfx_slider.rect.x, sfx_slider.rect.y - 24))
-
-
-    pygame.display.flip()
-    clock.tick(TICK_RATE)
-# Update settings dictionary
-pygame.quit()
\ No newline at end of file
+        if paused:
+            frame_rects.invalidate()  # draw_overlay darkened the whole world
+
+            # Draw title
+            title_text = text_renderer.render("PAUSED: Press P", (255, 255, 255), 64, system=True)
+            title_rect = title_text.get_rect(center=(WIDTH // 2, music_slider.rect.top - 60))
+            screen.blit(title_text, title_rect)
+
+            # Handle slider events
+            music_slider.handle_event(event)
+            sfx_slider.handle_event(event)
+
+            # Update music volume
+            current_channel.set_volume(music_slider.get_value())
+            settings.update(music_volume=music_slider.get_value(), sfx_volume=sfx_slider.get_value())
+
+            # Draw sliders
+            music_slider.draw(screen)
+            sfx_slider.draw(screen)
+
+            # Draw labels
+            music_label = text_renderer.render("Music Volume", (255, 255, 255), 28, system=True)
+            sfx_label = text_renderer.render("SFX Volume", (255, 255, 255), 28, system=True)
+
+            screen.blit(music_label, (music_slider.rect.x, music_slider.rect.y - 24))
+            screen.blit(sfx_label, (sfx_slider.rect.x, sfx_slider.rect.y - 24))
+
+
+        profiler.mark("hud")  # Pause menu
+        frame_rects.add(profiler.draw(screen))
+        profiler.mark("profiler")
+        frame_rects.present()
+        clock.tick(FPS_LIMIT)
+        profiler.mark("present")
+        profiler.end_frame()
+    if sim:
+        sim.stop()
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
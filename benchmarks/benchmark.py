@@ -0,0 +1,632 @@
+# Benchmarks for Gravitroids, run from the repository root so the game finds its assets:
+#   python benchmarks/benchmark.py physics
+#   python benchmarks/benchmark.py suite --baseline baseline.json --physics numpy
+# Options after the benchmark name that aren't listed below are game options (--physics,
+# --max-planets, --render-scale, --renderer, --integrator...)
+import os
+import sys
+import math
+import json
+import time
+import random
+import argparse
+import tempfile
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # No need for a real window or sound card
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pygame
+import Gravitroids as game
+import physics
+import gravitroids_env
+np = game.np
+
+BENCHMARK_SIGNIFICANCE = 0.01  # p-value below which a --baseline slowdown is not noise
+
+def benchmark_physics(counts=(8, 64, 512, 4096), frames=20):
+    # Speed of each backend over a few ticks against the time a 60 Hz tick has, with the part of
+    # the numpy backends spent in resolve_planets, the one planet at a time Python loop. Then a
+    # parity check: every tick the NumPy backend takes one step from the same state as the
+    # reference loop and must remove the same planets. Returns False if it didn't
+    backends = [("python", physics.step_planets_python)]
+    if np is not None:
+        backends.append(("numpy", physics.step_planets_numpy))
+        for theta in (0.5, 1.0):
+            backends.append((f"bh {theta}", lambda bodies, to_remove, theta=theta:
+                             physics.step_planets_numpy(bodies, to_remove, theta=theta)))
+    budget = 1000 / game.TICK_RATE
+    resolve = physics.resolve_planets
+    resolve_time = 0.0
+
+    def timed_resolve(*args):
+        nonlocal resolve_time
+        started = time.perf_counter()
+        result = resolve(*args)
+        resolve_time += time.perf_counter() - started
+        return result
+    physics.resolve_planets = timed_resolve
+    print(f"{'planets':>8} {'backend':>8} {'ms/frame':>10} {'resolve':>8}  {budget:.1f} ms budget")
+    for count in counts:
+        start_state = game.make_benchmark_planets(count)
+        for name, step in backends:
+            if name == "python" and count > 512 or name.startswith("bh") and count < physics.BARNES_HUT_MIN_BODIES:
+                continue
+            bodies = game.copy_planets(start_state)
+            elapsed = 0.0
+            resolve_time = 0.0
+            for _ in range(frames):
+                to_remove = set()
+                started = time.perf_counter()
+                step(bodies, to_remove)
+                elapsed += time.perf_counter() - started
+                bodies = [body for k, body in enumerate(bodies) if k not in to_remove]
+            ms = elapsed / frames * 1000
+            resolved = f"{resolve_time / frames * 1000:>8.3f}" if name != "python" else f"{'':>8}"
+            print(f"{count:>8} {name:>8} {ms:>10.3f} {resolved}  {'fits' if ms <= budget else f'{ms / budget:.1f}x over'}")
+    physics.resolve_planets = resolve
+    if np is None:
+        return True
+
+    passed = True
+    print(f"{'planets':>8} {'tick':>5} {'removed':>8} {'mismatch':>9} {'max |dpos|':>11}")
+    for count in counts:
+        if count > 512:
+            continue
+        bodies = game.make_benchmark_planets(count)
+        for tick in range(frames):
+            reference, batched = game.copy_planets(bodies), game.copy_planets(bodies)
+            removed, batched_removed = set(), set()
+            physics.step_planets_python(reference, removed)
+            physics.step_planets_numpy(batched, batched_removed)
+            mismatch = len(removed ^ batched_removed)
+            deviation = max((math.hypot(a.x - b.x, a.y - b.y) for k, (a, b) in enumerate(zip(reference, batched))
+                             if k not in removed | batched_removed), default=0.0)
+            if mismatch:
+                passed = False
+            if mismatch or tick == frames - 1:
+                print(f"{count:>8} {tick:>5} {len(removed):>8} {mismatch:>9} {deviation:>11.2e}"
+                      + ("  FAILED" if mismatch else ""))
+            bodies = [body for k, body in enumerate(reference) if k not in removed]
+    print("Parity passed" if passed else "Parity FAILED, the backends removed different planets")
+    return passed
+
+def benchmark_gravity(counts=(64, 512, 4096), thetas=(0.3, 0.5, 0.8, 1.0), repeats=5):
+    # Accuracy and speed of the Barnes-Hut forces against exact summation for the same planets.
+    # Up to 512 planets the reference is calculate_gravitational_force over all pairs
+    if np is None:
+        print("NumPy is not installed, the Barnes-Hut solver needs it")
+        return
+    print(f"{'planets':>8} {'solver':>14} {'ms/tick':>9} {'median err':>11} {'max err':>9}")
+    for count in counts:
+        bodies = game.make_benchmark_planets(count)
+        arrays = physics.PlanetArrays()
+        n = arrays.load(bodies)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            exact, _ = arrays.forces(n)
+        print(f"{count:>8} {'numpy exact':>14} {(time.perf_counter() - started) / repeats * 1000:>9.3f}")
+        reference = exact.copy()
+        if count <= 512:
+            started = time.perf_counter()
+            for i, planet in enumerate(bodies):
+                total_x, total_y = 0.0, 0.0
+                for j, other_planet in enumerate(bodies):
+                    if i != j:
+                        force = physics.calculate_gravitational_force(planet, other_planet)
+                        if force is not None:
+                            total_x += force[0] / planet.mass
+                            total_y += force[1] / planet.mass
+                reference[i] = total_x, total_y
+            print(f"{count:>8} {'python exact':>14} {(time.perf_counter() - started) * 1000:>9.3f}")
+        magnitude = np.maximum(np.hypot(reference[:, 0], reference[:, 1]), 1e-12)
+        for theta in thetas:
+            started = time.perf_counter()
+            for _ in range(repeats):
+                approx, _ = arrays.barnes_hut_forces(n, theta)
+            elapsed = (time.perf_counter() - started) / repeats
+            error = np.hypot(*(approx - reference).T) / magnitude
+            print(f"{count:>8} {f'theta={theta}':>14} {elapsed * 1000:>9.3f} {np.median(error):>11.2e} {error.max():>9.2e}")
+
+def benchmark_env(steps=20000, num_envs=None):
+    # Environment steps per second for one env in this process and for a VectorEnv
+    if np is None:
+        print("NumPy is not installed, the environments need it")
+        return
+    num_envs = num_envs or os.cpu_count() or 1
+    rng = random.Random(0)
+    env = gravitroids_env.GravitroidsEnv()
+    env.reset(0)
+    started = time.perf_counter()
+    for _ in range(steps):
+        _, _, done, _ = env.step(rng.randrange(gravitroids_env.ACTION_COUNT))
+        if done:
+            env.reset()
+    single = steps / (time.perf_counter() - started)
+    print(f"1 env in process: {single:.0f} steps/s")
+
+    vector = gravitroids_env.VectorEnv(num_envs)
+    vector.reset(0)
+    rounds = max(1, steps // num_envs)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        vector.step([rng.randrange(gravitroids_env.ACTION_COUNT) for _ in range(num_envs)])
+    total = rounds * num_envs / (time.perf_counter() - started)
+    vector.close()
+    print(f"{num_envs} envs in worker processes: {total:.0f} steps/s ({total / single:.1f}x)")
+
+def draw_hud_uncached(screen):
+    # The HUD as it was drawn before TextRenderer and HudPanel
+    points_window = pygame.Surface((170, 70), pygame.SRCALPHA)
+    points_window.fill(game.TRANSLUCENT_WHITE)
+    points_font = pygame.font.Font(None, 36)
+    points_text = points_font.render(f"Points: {game.player.points:.0f}", True, game.TEXT_COLOR)
+    points_window.blit(points_text, (10, 10))
+    screen.blit(points_window, (0, 0))
+    selected_planet = game.planet_pool.get(game.selected_handle)
+    if selected_planet:
+        box_width = 320
+        stats_window = pygame.Surface((box_width, 130), pygame.SRCALPHA)
+        stats_window.fill(game.TRANSLUCENT_WHITE)
+        mass_text = pygame.font.Font(None, 36).render(f"Mass: {selected_planet.mass:.2f}kg", True, game.TEXT_COLOR)
+        velocity_text = pygame.font.Font(None, 36).render(f"Velocity: ({selected_planet.velocity[0]:.2f}, {selected_planet.velocity[1]:.2f})", True, game.TEXT_COLOR)
+        name_text = pygame.font.Font(None, 36).render(f"Name: {selected_planet.name}", True, game.TEXT_COLOR)
+        momentum_text = pygame.font.Font(None, 36).render(f"Momentum: ({selected_planet.velocity[0]/selected_planet.mass:.2f}, {selected_planet.velocity[1]/selected_planet.mass:.2f})", True, game.TEXT_COLOR)
+        stats_window.blit(name_text, (10, 10))
+        stats_window.blit(mass_text, (10, 40))
+        stats_window.blit(velocity_text, (10, 70))
+        stats_window.blit(momentum_text, (10, 100))
+        screen.blit(stats_window, (game.WIDTH - box_width, 0))
+
+def benchmark_hud(frames=600):
+    # Per-frame HUD cost with a selected planet, rendering faster than the physics ticks
+    game.game_rng.seed(0)
+    game.player = game.Player(game.WIDTH // 2, game.HEIGHT // 2, 0, 15)
+    game.planets = [game.spawn_planet(400, 300)]
+    game.selected_handle = game.planet_pool.handle(game.planets[0])
+    selected_planet = game.planets[0]
+    def draw_hud(screen):
+        return game.draw_hud_panels(screen, game.player.points, game.planet_stats(selected_planet))
+
+    for name, draw in (("uncached", draw_hud_uncached), ("cached", draw_hud)):
+        started = time.perf_counter()
+        for frame in range(frames):
+            if frame % 2 == 0:  # Two frames per physics tick, the planet's stats change every tick
+                selected_planet.velocity[0] += 0.01
+                selected_planet.update_position(physics.TIME_SCALE)
+            if frame % 30 == 0:
+                game.player.points += 1
+            draw(game.screen)
+        print(f"{name:>9} HUD: {(time.perf_counter() - started) / frames * 1000:.3f} ms/frame")
+
+def benchmark_render(frames=1200, seed=0):
+    # Render cost of both renderers on the demo input, two frames are drawn per physics tick.
+    # With the dummy video driver presenting is almost free, so this mostly shows the drawing side
+    script = game.InputScript()
+    for mode in ("flip", "dirty"):
+        game.game_rng.seed(seed)
+        game.reset_game()
+        for _ in range(game.MAX_PLANETS):
+            game.place_planet(game.game_rng.randint(100, game.WIDTH - 100),
+                              game.game_rng.randint(100, game.HEIGHT - 100))
+        game.frame_rects = game.DirtyRects(mode == "dirty")
+        points = None
+        wall = cpu = 0.0
+        for frame in range(frames):
+            if frame % 2 == 0 and game.simulate_tick(script.controls(frame // 2)):
+                game.reset_game()
+                game.frame_rects.invalidate()
+            started, cpu_started = time.perf_counter(), time.process_time()
+            if game.player.points != points:
+                points = game.player.points
+                background = game.BACKGROUND_COLOR
+                game.BACKGROUND_COLOR = game.gradient_color(points)
+                if game.BACKGROUND_COLOR != background:
+                    game.frame_rects.invalidate()
+            game.frame_rects.restore(game.world_surface, game.BACKGROUND_COLOR)
+            game.frame_rects.add(game.draw_world(0.5 if frame % 2 else 1.0))
+            game.frame_rects.present()
+            wall += time.perf_counter() - started
+            cpu += time.process_time() - cpu_started
+        print(f"{mode:>6}: {frames / wall:7.0f} fps, {wall / frames * 1000:.3f} ms/frame, "
+              f"{cpu / frames * 1000:.3f} ms CPU/frame, {game.frame_rects.full_frames} full redraws")
+
+def benchmark_draw(frames=300, seed=0):
+    # Draw calls and time per frame of drawing every shape on its own against DrawList, with 8
+    # and 500 planets and MAX_BULLETS bullets in flight. The background, world and HUD are timed,
+    # not presenting
+
+    def draw_immediate(alpha):
+        # The world as it was drawn before DrawList, a blit and a circle per planet and a line per
+        # trajectory segment
+        scale = game.RENDER_SCALE
+        for planet in game.planets:
+            x, y = game.interpolate(planet, alpha)
+            game.world_surface.blit(planet.glow_texture, planet.glow_texture.get_rect(center=(x * scale, y * scale)))
+            pygame.draw.circle(game.world_surface, planet.color, (int(x * scale), int(y * scale)), int(planet.radius * scale))
+        trajectory_points, hit = game.trajectory_predictor.predict(game.player, game.planets)
+        color = (255, 0, 0) if hit else (0, 255, 0)
+        trajectory_points = [(x * scale, y * scale) for x, y in trajectory_points]
+        for i in range(1, len(trajectory_points)):
+            pygame.draw.line(game.world_surface, color, trajectory_points[i - 1], trajectory_points[i], 1)
+        if trajectory_points:
+            game.draw_ship(game.world_surface, *trajectory_points[-1], game.player.angle, color, width=1)
+        x, y = game.interpolate(game.player, alpha)
+        game.draw_ship(game.world_surface, x * scale, y * scale, game.player.angle, (255, 255, 255))
+        bullets = game.player.bullets
+        sprite = game.sprite_cache.bullet(bullets.radius)
+        r = sprite.get_width() // 2
+        game.world_surface.blits([(sprite, (int((bullets.prev_x[i] + (bullets.x[i] - bullets.prev_x[i]) * alpha) * scale) - r,
+                                            int((bullets.prev_y[i] + (bullets.y[i] - bullets.prev_y[i]) * alpha) * scale) - r))
+                                  for i in range(bullets.count)])
+        if game.world_surface is not game.screen:
+            pygame.transform.scale(game.world_surface, game.screen.get_size(), game.screen)
+        game.draw_hud_panels(game.screen, game.player.points, game.planet_stats(game.planet_pool.get(game.selected_handle)))
+
+    game.BACKGROUND_COLOR = game.gradient_color(10)
+    for count in (8, 500):
+        game.game_rng.seed(seed)
+        game.reset_game()
+        game.planets.extend(game.Planet(body.x, body.y, body.mass, list(body.velocity), body.color, body.name)
+                            for body in game.make_benchmark_planets(count, seed))
+        for k in range(game.MAX_BULLETS):
+            game.player.bullets.add(game.WIDTH / 2, game.HEIGHT / 2, k * 360 / game.MAX_BULLETS)
+        # A blit and a circle per planet, a line per trajectory segment, the ghost, the ship and the bullets' blits()
+        trajectory_points, hit = game.trajectory_predictor.predict(game.player, game.planets)
+        immediate_calls = 2 * len(game.planets) + max(0, len(trajectory_points) - 1) + (1 if trajectory_points else 0) + 2
+        for name, draw in (("immediate", draw_immediate), ("batched", game.draw_world)):
+            calls = game.draw_list.calls
+            started = time.perf_counter()
+            for frame in range(frames):
+                game.world_surface.fill(game.BACKGROUND_COLOR)
+                draw(0.5 if frame % 2 else 1.0)
+            elapsed = time.perf_counter() - started
+            frame_calls = (game.draw_list.calls - calls) / frames if draw is game.draw_world else immediate_calls
+            print(f"{count:>4} planets, {name:>9}: {frame_calls:4.0f} draw calls, {elapsed / frames * 1000:.3f} ms/frame")
+
+def benchmark_pipeline(seconds=10.0, seed=0):
+    # Frame times of the normal loop and of --pipeline on the demo input, with MAX_PLANETS planets
+    # placed at the start and frames as fast as FPS_LIMIT allows. In the normal loop a frame that
+    # also ran a tick (or a heavy one with splits) takes longer than the others, the spread of
+    # the frame times is the jitter
+    game.frame_rects = game.DirtyRects(game.ARGS.renderer == "dirty")
+    for mode in ("loop", "pipeline"):
+        game.game_rng.seed(seed)
+        game.reset_game()
+        for _ in range(game.MAX_PLANETS):
+            game.place_planet(game.game_rng.randint(100, game.WIDTH - 100),
+                              game.game_rng.randint(100, game.HEIGHT - 100))
+        script = game.InputScript()
+        sim = game.SimulationThread(script=script) if mode == "pipeline" else None
+        game.frame_rects.invalidate()
+        points = None
+        frame_times = []
+        ticks = 0
+        accumulator = 0.0
+        started = previous = time.perf_counter()
+        if sim:
+            sim.start()
+        while previous - started < seconds:
+            if sim:
+                snapshot = sim.front
+                if snapshot.death:
+                    game.reset_game()
+                    sim.resume()
+                    continue
+                frame_points = snapshot.points
+            else:
+                frame_points = game.player.points
+            if frame_points != points:
+                points = frame_points
+                background = game.BACKGROUND_COLOR
+                game.BACKGROUND_COLOR = game.gradient_color(points)
+                if game.BACKGROUND_COLOR != background:
+                    game.frame_rects.invalidate()
+            game.frame_rects.restore(game.world_surface, game.BACKGROUND_COLOR)
+            if sim:
+                game.frame_rects.add(game.draw_snapshot(snapshot, sim.alpha(snapshot)))
+            else:
+                substeps = 0
+                while accumulator >= game.PHYSICS_DT and substeps < game.MAX_SUBSTEPS:
+                    accumulator -= game.PHYSICS_DT
+                    substeps += 1
+                    if game.simulate_tick(script.controls(ticks)):
+                        game.reset_game()
+                        game.frame_rects.invalidate()
+                    ticks += 1
+                if substeps == game.MAX_SUBSTEPS:
+                    accumulator = min(accumulator, game.PHYSICS_DT)
+                game.frame_rects.add(game.draw_world(accumulator / game.PHYSICS_DT))
+            game.frame_rects.present()
+            game.clock.tick(game.FPS_LIMIT)
+            now = time.perf_counter()
+            frame_times.append((now - previous) * 1000)
+            accumulator += now - previous
+            previous = now
+        if sim:
+            sim.stop()
+            ticks = sim.ticks
+        elapsed = previous - started
+        mean = sum(frame_times) / len(frame_times)
+        deviation = math.sqrt(sum((t - mean) ** 2 for t in frame_times) / len(frame_times))
+        frame_times.sort()
+        print(f"{mode:>8}: {len(frame_times) / elapsed:6.0f} fps, {ticks / elapsed:5.1f} ticks/s, frame "
+              f"{mean:.2f} ms mean, {deviation:.2f} ms stdev, p50 {game.percentile(frame_times, 50):.2f} "
+              f"p95 {game.percentile(frame_times, 95):.2f} p99 {game.percentile(frame_times, 99):.2f} "
+              f"max {frame_times[-1]:.2f} ms")
+
+def time_call(function, number=None, repeats=7, setup=None, min_time=0.1):
+    # Median and best time per call in ms over several repeats, setup runs untimed before each.
+    # Without a number of calls, it is doubled until one repeat takes at least min_time seconds
+    # like timeit's autorange, so fast calls are not timed a handful at a time
+    def run(count):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for _ in range(count):
+            function()
+        return time.perf_counter() - started
+
+    if number is None:
+        number = 1
+        while run(number) < min_time:
+            number *= 2
+    runs = sorted(run(number) / number * 1000 for _ in range(repeats))
+    return {"median_ms": runs[len(runs) // 2], "min_ms": runs[0], "calls": number, "repeats": repeats,
+            "runs_ms": runs}
+
+def slower_p_value(before, now):
+    # One-sided Mann-Whitney U test that the times in now are larger than the ones in before,
+    # with the normal approximation. Small values mean the slowdown is not noise
+    u = sum(1.0 if a > b else 0.5 if a == b else 0.0 for a in now for b in before)
+    n, m = len(now), len(before)
+    spread = math.sqrt(n * m * (n + m + 1) / 12)
+    z = (u - n * m / 2 - 0.5) / spread
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def benchmark_scenarios(seed=0):
+    # Fixed planet sets: jittered grids of 8, 64 and 512 planets, and 64 small planets packed
+    # around the middle of the screen where the player starts
+    scenarios = {f"grid{count}": game.make_benchmark_planets(count, seed) for count in (8, 64, 512)}
+    rng = random.Random(seed)
+    cluster = []
+    for _ in range(64):
+        angle = rng.uniform(0, 2 * math.pi)
+        distance = rng.uniform(60, 300)
+        cluster.append(game.Planet(game.WIDTH / 2 + distance * math.cos(angle), game.HEIGHT / 2 + distance * math.sin(angle),
+                                   rng.uniform(2, 10), [rng.uniform(-1, 1), rng.uniform(-1, 1)],
+                                   (rng.randint(50, 255), rng.randint(50, 255), rng.randint(50, 255)), "Benchmark"))
+    scenarios["cluster64"] = cluster
+    return scenarios
+
+def benchmark_suite(output, baseline_path=None, threshold=0.2, seed=0):
+    # Every hot path on the same seeded scenarios, so runs on one machine can be compared. The
+    # results are written to output and compared with the ones in baseline_path, returns False
+    # on a regression past threshold
+    scenarios = benchmark_scenarios(seed)
+    results = {}
+
+    def record(name, result):
+        results[name] = result
+        print(f"{name:<32} {result['median_ms']:>10.4f} ms  (best {result['min_ms']:.4f})")
+
+    for scenario, bodies in scenarios.items():
+        def gravity_pairs():
+            for planet in bodies:
+                for other_planet in bodies:
+                    if planet is not other_planet:
+                        physics.calculate_gravitational_force(planet, other_planet)
+        record(f"gravity_pairs/{scenario}", time_call(gravity_pairs))
+        game.player = game.Player(game.WIDTH // 2, game.HEIGHT // 2, 0, 15)
+        record(f"player_gravity/{scenario}", time_call(lambda: game.player.player_gravity(bodies)))
+        record(f"predict_trajectory/{scenario}", time_call(lambda: game.predict_trajectory(game.player, bodies)))
+
+    color = (120, 200, 80)
+    record("create_glow_texture/r30", time_call(lambda: game.create_glow_texture(30, color, 20)))
+    record("create_glow_texture/r90", time_call(lambda: game.create_glow_texture(90, color, 50)))
+    planet = game.Planet(game.WIDTH / 2, game.HEIGHT / 2, 40, [0.5, 0.5], color, "Benchmark")
+    def split():
+        for new_planet in planet.split(30):
+            game.planet_pool.release(new_planet)
+    record("planet_split", time_call(split))
+
+    game.player = game.Player(game.WIDTH // 2, game.HEIGHT // 2, 0, 15)
+    levels = iter(range(10**9))
+    def gradient():
+        game.player.points = next(levels) % 200
+        game.gradient_and_music(game.player.points)
+    record("gradient_and_music", time_call(gradient))
+
+    # A whole frame: one physics tick with 64 planets and 50 bullets in flight, drawing and presenting
+    def start_frames():
+        game.game_rng.seed(seed)
+        game.reset_game()
+        game.player.points = 10**6
+        game.planets.extend(game.Planet(body.x, body.y, body.mass, list(body.velocity), body.color, body.name)
+                            for body in scenarios["grid64"])
+        for k in range(game.MAX_BULLETS):
+            game.player.bullets.add(game.WIDTH / 2, game.HEIGHT / 2, k * 360 / game.MAX_BULLETS)
+        game.frame_rects.invalidate()
+    frame_controls = game.Controls(up=True)
+    def frame():
+        game.simulate_tick(frame_controls)
+        game.BACKGROUND_COLOR = game.gradient_color(game.player.points)
+        game.frame_rects.restore(game.world_surface, game.BACKGROUND_COLOR)
+        game.frame_rects.add(game.draw_world(1.0))
+        game.frame_rects.present()
+    for mode in ("flip", "dirty"):
+        game.frame_rects = game.DirtyRects(mode == "dirty")
+        record(f"frame/{mode}", time_call(frame, 60, setup=start_frames))  # Every repeat starts over
+
+    report = {
+        "meta": {
+            "seed": seed,
+            "python": sys.version.split()[0],
+            "pygame": pygame.version.ver,
+            "numpy": np.__version__ if np is not None else None,
+            "physics": game.PHYSICS_BACKEND,
+            "collisions": game.COLLISIONS,
+            "integrator": game.INTEGRATOR,
+            "platform": sys.platform,
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if not baseline_path:
+        return True
+    if not os.path.exists(baseline_path):
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"No baseline yet, saved this run as {baseline_path}")
+        return True
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)["results"]
+    # A regression is a best time slower by more than the threshold that the repeats also show
+    # is not noise. Baselines from before the repeats were saved only have the threshold to go by
+    regressions = []
+    print(f"{'benchmark (best ms)':<32} {'baseline':>10} {'now':>10} {'change':>8} {'p':>7}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, now = baseline[name]["min_ms"], result["min_ms"]  # Best runs are the least noisy
+        change = now / before - 1
+        p_value = slower_p_value(baseline[name]["runs_ms"], result["runs_ms"]) if "runs_ms" in baseline[name] else 0.0
+        flag = ""
+        if change > threshold and p_value < BENCHMARK_SIGNIFICANCE:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<32} {before:>10.4f} {now:>10.4f} {change:>+8.1%} {p_value:>7.4f}{flag}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) past {threshold:.0%}: {', '.join(regressions)}")
+    return not regressions
+
+def benchmark_leaderboard(runs=300000, seed=0):
+    # Leaderboard queries on a scratch database filled with random runs from 1000 players
+    rng = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(), "leaderboard.db")
+    board = game.Leaderboard(path)
+    started = time.perf_counter()
+    board.record_many((f"player{rng.randrange(1000)}", rng.randrange(0, 2000, 2), rng.choice(("collision", "points")),
+                       rng.uniform(5, 600), rng.randrange(200), rng.randrange(100), 0) for _ in range(runs))
+    print(f"Filled {runs} runs in {time.perf_counter() - started:.2f}s")
+    queries = {
+        "record": lambda: board.record("player1", rng.randrange(0, 2000, 2), "collision", 60.0, 10, 5),
+        "rank": lambda: board.rank(rng.randrange(0, 2000, 2)),
+        "top 10": lambda: board.top(10),
+        "player best": lambda: board.best(f"player{rng.randrange(1000)}"),
+        "recent 10": lambda: board.recent(10),
+    }
+    for name, query in queries.items():
+        timing = time_call(query)
+        print(f"{name:>12}: {timing['median_ms']:.3f} ms")
+    board.close()
+    os.remove(path)
+
+def benchmark_integrators():
+    # Each integrator on two fixed setups in the trajectory preview's gravity field:
+    #   orbit: 3000 ticks of an eccentric orbit passing 2 px above the planet every lap, the energy
+    #          should not drift. The largest drift along the way is reported, not just the end
+    #   flyby: 32 ticks swinging past the planet like a preview, compared with a very fine leapfrog path
+    predictor = game.TrajectoryPredictor()
+    predictor.planet_state = [(0.0, 0.0, 40.0, 8.0)]
+    mass = 40.0
+    evaluations = [0]
+
+    def acceleration(x, y):
+        evaluations[0] += 1
+        return predictor.acceleration(x, y)
+
+    def energy(x, y, vx, vy):
+        return (vx * vx + vy * vy) / 2 - physics.GRAVITY_CONSTANT * mass / math.hypot(x, y)
+
+    def run(step, dt, start, ticks, track_energy=False):
+        evaluations[0] = 0
+        state = start
+        drift = 0.0
+        for _ in range(round(ticks / dt)):
+            state = step(*state, dt, acceleration)
+            if state is None:
+                break
+            if track_energy:
+                drift = max(drift, abs(energy(*state) / energy(*start) - 1))
+        return state, evaluations[0], drift
+
+    orbit_speed = math.sqrt(physics.GRAVITY_CONSTANT * mass / 120) * 0.4
+    orbit = (120.0, 0.0, 0.0, orbit_speed)
+    flyby = (-150.0, 40.0, 3.0, 0.0)
+    reference, _, _ = run(physics.leapfrog_step, 1 / 512, flyby, 32)
+    for name, step in physics.INTEGRATORS.items():
+        for dt in (0.5, 1.0, 2.0, 4.0):
+            state, orbit_evaluations, worst = run(step, dt, orbit, 3000, track_energy=True)
+            if state is None:
+                drift = "crashed into the planet"
+            else:
+                drift = f"max energy drift {worst * 100:8.4f}%"
+            state, flyby_evaluations, _ = run(step, dt, flyby, 32)
+            if state is None:
+                error = "crashed into the planet"
+            else:
+                error = f"off by {math.hypot(state[0] - reference[0], state[1] - reference[1]):7.3f} px"
+            print(f"{name:>9} dt {dt}: orbit {drift} with {orbit_evaluations:6} evaluations, "
+                  f"flyby {error} with {flyby_evaluations:4} evaluations")
+
+parser = argparse.ArgumentParser(description="Gravitroids benchmarks, other options are passed to the game")
+parser.add_argument("benchmark", choices=["physics", "gravity", "integrators", "env", "hud", "render", "draw",
+                                          "pipeline", "suite", "leaderboard"],
+                    help="physics: time both physics backends for 8/64/512/4096 planets and check they agree. "
+                         "gravity: Barnes-Hut accuracy and speed against exact gravity. "
+                         "integrators: energy drift, accuracy and force evaluations of the integrators. "
+                         "env: environment steps per second for one env and a VectorEnv. "
+                         "hud: the HUD with and without the text caches. "
+                         "render: frame times of the flip and dirty renderers. "
+                         "draw: draw calls and frame time of one call per shape and the batched draw list. "
+                         "pipeline: frame time jitter of the normal loop and --pipeline. "
+                         "suite: the physics, collision, prediction and rendering hot paths on fixed scenarios. "
+                         "leaderboard: the leaderboard queries on a scratch database")
+parser.add_argument("--seconds", type=float, default=10.0,
+                    help="pipeline: seconds to run each mode for")
+parser.add_argument("--runs", type=int, default=300000,
+                    help="leaderboard: runs in the scratch database")
+parser.add_argument("--output", default="benchmark_results.json", metavar="FILE",
+                    help="suite: where the results are written")
+parser.add_argument("--baseline", metavar="FILE",
+                    help="suite: compare the results against FILE, which is created from this run if missing")
+parser.add_argument("--threshold", type=float, default=0.2,
+                    help="suite: slowdown against the baseline that counts as a regression (0.2 is 20%%)")
+
+def main(argv=None):
+    # Returns the exit status, 1 when the physics parity check or the suite's baseline comparison fails
+    args, game_args = parser.parse_known_args(argv)
+    if args.benchmark == "env":
+        game_args.append("--headless")
+    game.configure(game.parser.parse_args(game_args))
+    game.trajectory_predictor = game.TrajectoryPredictor(game.PREDICTION_STEPS, game.PREDICTION_DT)
+    game.init_display()
+    game.frame_rects = game.DirtyRects(game.ARGS.renderer == "dirty")
+    passed = True
+    if args.benchmark == "physics":
+        passed = benchmark_physics()
+    elif args.benchmark == "gravity":
+        benchmark_gravity()
+    elif args.benchmark == "integrators":
+        benchmark_integrators()
+    elif args.benchmark == "env":
+        benchmark_env()
+    elif args.benchmark == "hud":
+        benchmark_hud()
+    elif args.benchmark == "render":
+        benchmark_render()
+    elif args.benchmark == "draw":
+        benchmark_draw()
+    elif args.benchmark == "pipeline":
+        benchmark_pipeline(args.seconds)
+    elif args.benchmark == "suite":
+        passed = benchmark_suite(args.output, args.baseline, args.threshold)
+    elif args.benchmark == "leaderboard":
+        benchmark_leaderboard(args.runs)
+    pygame.quit()
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# Training environment for Gravitroids: GravitroidsEnv runs the game rules without a window
+# and VectorEnv runs several of them in worker processes
+import math
+import multiprocessing
+import Gravitroids as game
+np = game.np
+
+OBSERVED_PLANETS = 8  # Nearest planets included in an observation
+OBSERVATION_SIZE = 7 + OBSERVED_PLANETS * 7
+ACTION_COUNT = 16  # Every combination of the Controls bits
+
+class GravitroidsEnv:
+    # Gym-style wrapper around the game rules: reset(seed) -> observation and
+    # step(action) -> (observation, reward, done, info). The reward is the change in
+    # player.points and done is set on the same conditions as the death screen.
+    # The game keeps its state in module globals, so there is one environment per process,
+    # use VectorEnv to run several side by side
+    def __init__(self):
+        if np is None:
+            raise RuntimeError("GravitroidsEnv needs NumPy")
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+
+    def reset(self, seed=None):
+        game.game_rng.seed(seed)
+        game.reset_game()
+        return self.observe()
+
+    def step(self, action):
+        points = game.player.points
+        cause = game.simulate_tick(game.Controls.from_bits(int(action)))
+        reward = game.player.points - points
+        return self.observe(), reward, cause is not None, {"cause": cause, "points": game.player.points}
+
+    def observe(self):
+        # Player state, then the nearest planets relative to the player (zeros when missing).
+        # Everything is scaled to roughly -1..1
+        observation = self.observation
+        observation[:] = 0
+        player = game.player
+        rad_angle = math.radians(player.angle)
+        observation[:7] = (player.x / game.WIDTH, player.y / game.HEIGHT, player.vx / game.MAX_PLAYER_SPEED,
+                           player.vy / game.MAX_PLAYER_SPEED, math.cos(rad_angle), math.sin(rad_angle),
+                           player.points / 100)
+        nearest = sorted(game.planets, key=lambda planet: (planet.x - player.x) ** 2 + (planet.y - player.y) ** 2)
+        for k, planet in enumerate(nearest[:OBSERVED_PLANETS]):
+            start = 7 + k * 7
+            observation[start:start + 7] = ((planet.x - player.x) / game.WIDTH, (planet.y - player.y) / game.HEIGHT,
+                                            planet.velocity[0], planet.velocity[1], planet.mass / 50,
+                                            planet.radius / 50, 1.0)
+        return observation
+
+def env_worker(index, connection, observation_buffer, reward_buffer, done_buffer, args):
+    # Runs one GravitroidsEnv and writes its results straight into the shared buffers.
+    # The worker imported the game afresh, so it takes the parent's options
+    game.configure(args)
+    env = GravitroidsEnv()
+    observations = np.frombuffer(observation_buffer, dtype=np.float32).reshape(-1, OBSERVATION_SIZE)
+    rewards = np.frombuffer(reward_buffer, dtype=np.float32)
+    dones = np.frombuffer(done_buffer, dtype=np.uint8)
+    while True:
+        command, value = connection.recv()
+        if command == "step":
+            observation, reward, done, info = env.step(value)
+            if done:
+                observation = env.reset()  # Start the next episode right away, like most vector envs
+            observations[index] = observation
+            rewards[index] = reward
+            dones[index] = done
+        elif command == "reset":
+            observations[index] = env.reset(value)
+        elif command == "close":
+            break
+        connection.send(None)
+
+class VectorEnv:
+    # Steps num_envs independent GravitroidsEnv instances in worker processes. Observations,
+    # rewards and done flags live in shared memory, only the actions go through the pipes.
+    # Finished episodes are reset automatically
+    def __init__(self, num_envs):
+        if np is None:
+            raise RuntimeError("VectorEnv needs NumPy")
+        context = multiprocessing.get_context("spawn")  # Importing the game has no side effects, main() is guarded
+        self.num_envs = num_envs
+        observation_buffer = context.RawArray("f", num_envs * OBSERVATION_SIZE)
+        reward_buffer = context.RawArray("f", num_envs)
+        done_buffer = context.RawArray("B", num_envs)
+        self.observations = np.frombuffer(observation_buffer, dtype=np.float32).reshape(num_envs, OBSERVATION_SIZE)
+        self.rewards = np.frombuffer(reward_buffer, dtype=np.float32)
+        self.dones = np.frombuffer(done_buffer, dtype=np.uint8)
+        self.connections = []
+        self.workers = []
+        for index in range(num_envs):
+            parent, child = context.Pipe()
+            worker = context.Process(target=env_worker, args=(index, child, observation_buffer, reward_buffer, done_buffer, game.ARGS), daemon=True)
+            worker.start()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+    def call(self, command, values):
+        for connection, value in zip(self.connections, values):
+            connection.send((command, value))
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self, seed=0):
+        self.call("reset", [seed + index for index in range(self.num_envs)])
+        return self.observations
+
+    def step(self, actions):
+        # The returned arrays are views of the shared buffers and change on the next step
+        self.call("step", [int(action) for action in actions])
+        return self.observations, self.rewards, self.dones.astype(bool)
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close", None))
+        for worker in self.workers:
+            worker.join()
@@ -0,0 +1,565 @@
+# Planet physics for Gravitroids: the integrators, gravity and merges of the python and numpy
+# backends, the Barnes-Hut quadtree and the collision geometry. Nothing here uses pygame or the
+# game's settings, tick lengths and opening angles are passed in
+import math
+try:
+    import numpy as np  # Optional, only needed for the numpy physics backend
+except ImportError:
+    np = None
+
+WIDTH, HEIGHT = 1536, 864  # Planets that leave this area are removed
+GRAVITY_CONSTANT = 10
+PLANET_RADIUS_SCALE = 1.5
+TIME_SCALE = 0.5
+BARNES_HUT_MIN_BODIES = 384  # Below this many planets exact summation is faster, measured with benchmarks/benchmark.py gravity
+ADAPTIVE_TOLERANCE = 0.01  # Position error (px) plus velocity error over the step before a step is split
+ADAPTIVE_MAX_DEPTH = 6  # Times a step can be halved, substeps are at least 1/64 of it
+ADAPTIVE_GROWTH_MARGIN = 16  # Error this many times under the tolerance doubles the next substep
+
+# Integrators move one body for dt under acceleration(x, y), which returns None when the point
+# is inside a planet. They return the new (x, y, vx, vy), or None if they ran into a planet
+def euler_step(x, y, vx, vy, dt, acceleration):
+    # Semi-implicit Euler: kick with the acceleration where the body is, then drift
+    acc = acceleration(x, y)
+    if acc is None:
+        return None
+    vx += acc[0] * dt
+    vy += acc[1] * dt
+    return x + vx * dt, y + vy * dt, vx, vy
+
+def leapfrog_step(x, y, vx, vy, dt, acceleration):
+    # Drift half a step, kick with the acceleration there, drift the other half. Same cost as
+    # Euler, but symplectic: orbits keep their energy instead of slowly spiralling out
+    half = dt / 2
+    x += vx * half
+    y += vy * half
+    acc = acceleration(x, y)
+    if acc is None:
+        return None
+    vx += acc[0] * dt
+    vy += acc[1] * dt
+    return x + vx * half, y + vy * half, vx, vy
+
+def adaptive_step(x, y, vx, vy, dt, acceleration):
+    # Leapfrog with step doubling: a substep is compared with two half substeps. When they agree
+    # to within ADAPTIVE_TOLERANCE they are combined by Richardson extrapolation (one order more
+    # accurate than either), otherwise the substep is halved and the half substep that was just
+    # worked out becomes the next whole one. After a substep that was well inside the tolerance
+    # the next one is twice as long again, up to dt. Close passes get small steps, open space
+    # does not
+    state = (x, y, vx, vy)
+    shortest = dt / 2 ** ADAPTIVE_MAX_DEPTH
+    size = dt
+    done = 0.0
+    whole = None
+    while done < dt:
+        step = min(size, dt - done)
+        if whole is None:
+            whole = leapfrog_step(*state, step, acceleration)
+        first = leapfrog_step(*state, step / 2, acceleration)
+        second = first and leapfrog_step(*first, step / 2, acceleration)
+        if whole and second:
+            error = (abs(second[0] - whole[0]) + abs(second[1] - whole[1])
+                     + (abs(second[2] - whole[2]) + abs(second[3] - whole[3])) * step)
+            if error <= ADAPTIVE_TOLERANCE or step <= shortest:
+                state = tuple(b + (b - a) / 3 for a, b in zip(whole, second))
+                done += step
+                whole = None
+                if error * ADAPTIVE_GROWTH_MARGIN <= ADAPTIVE_TOLERANCE:
+                    size = min(size * 2, dt)
+                continue
+        elif step <= shortest:
+            if second is None:
+                return None  # Ran into a planet
+            state = second  # Only the whole substep touched the planet, carry on from the two halves
+            done += step
+            whole = None
+            continue
+        size = step / 2
+        whole = first
+    return state
+
+INTEGRATORS = {"euler": euler_step, "leapfrog": leapfrog_step, "adaptive": adaptive_step}
+
+def calculate_gravitational_force(planet1, planet2):
+    dx = planet2.x - planet1.x
+    dy = planet2.y - planet1.y
+    distance = math.sqrt(dx**2 + dy**2)
+    if distance <= planet1.radius + planet2.radius:
+        return None  # Collision
+    force = GRAVITY_CONSTANT * planet1.mass * planet2.mass / distance**1.75
+    angle = math.atan2(dy, dx)
+    return force * math.cos(angle), force * math.sin(angle)
+
+def merge_planets(planet, other_planet):
+    # Merge two touching planets, returns the one that gets absorbed (None if both annihilate)
+    if planet.mass / other_planet.mass > 1.25 or planet.mass / other_planet.mass < 0.8:
+        # Significant mass difference
+        i_momentum = [planet.mass * planet.velocity[0], planet.mass * planet.velocity[1]]
+        j_momentum = [other_planet.mass * other_planet.velocity[0], other_planet.mass * other_planet.velocity[1]]
+        new_momentum = [i_momentum[0] + j_momentum[0], i_momentum[1] + j_momentum[1]]
+        total_mass = planet.mass + other_planet.mass
+        velocity = [new_momentum[0] / total_mass, new_momentum[1] / total_mass]
+
+        if planet.mass > other_planet.mass:
+            bigger, smaller = planet, other_planet
+        else:
+            bigger, smaller = other_planet, planet
+        bigger.mass = total_mass
+        bigger.velocity[0], bigger.velocity[1] = velocity
+        bigger.radius = ((bigger.mass ** (3 / 4)) * PLANET_RADIUS_SCALE)
+        bigger.refresh_glow()
+        return smaller
+    return None
+
+def step_planets_python(planets, to_remove, time_scale=TIME_SCALE, tick_scale=1.0):
+    # Reference planet-planet loop: pairwise gravity, merges and movement, one planet at a time.
+    # The force is calculate_gravitational_force written out in place, with the same arithmetic
+    # in the same order so recorded replays still come out the same. tick_scale is the length of
+    # a physics tick in 60 Hz ticks
+    for i, planet in enumerate(planets):
+        if i in to_remove:
+            continue  # Skip already removed planets
+        x, y, radius, mass, velocity = planet.x, planet.y, planet.radius, planet.mass, planet.velocity
+        for j, other_planet in enumerate(planets):
+            if i != j and j not in to_remove:
+                dx = other_planet.x - x
+                dy = other_planet.y - y
+                distance = math.sqrt(dx**2 + dy**2)
+                if distance <= radius + other_planet.radius:
+                    # Collision detected
+                    absorbed = merge_planets(planet, other_planet)
+                    if absorbed is None:
+                        to_remove.add(i)
+                        to_remove.add(j)
+                    elif absorbed is planet:
+                        to_remove.add(i)  # Remove the current planet
+                    else:
+                        to_remove.add(j)  # Remove the smaller planet
+                    break
+                force = GRAVITY_CONSTANT * mass * other_planet.mass / distance**1.75
+                angle = math.atan2(dy, dx)
+                velocity[0] += force * math.cos(angle) / mass * tick_scale
+                velocity[1] += force * math.sin(angle) / mass * tick_scale
+
+        if i not in to_remove:
+            planet.update_position(time_scale)  # Update position with time scale
+            if planet.is_offscreen():
+                to_remove.add(i)
+
+class PlanetArrays:
+    # Contiguous planet state for the numpy backend. Buffers only grow, so a steady
+    # planet count does not allocate every tick
+    BLOCK = 256  # Rows of the pair matrix handled at once, keeps memory flat for thousands of planets
+
+    def __init__(self, capacity=64):
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.pos = np.zeros((capacity, 2))
+        self.vel = np.zeros((capacity, 2))
+        self.mass = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        self.acc = np.zeros((capacity, 2))
+        self.last_acceleration = 1.0  # Largest acceleration of the last tick, for the contact reach
+
+    def load(self, bodies):
+        n = len(bodies)
+        if n == 0:
+            return 0
+        if n > self.capacity:
+            self.allocate(max(n, self.capacity * 2))
+        self.pos[:n] = [(body.x, body.y) for body in bodies]
+        self.vel[:n] = [body.velocity for body in bodies]
+        self.mass[:n] = [body.mass for body in bodies]
+        self.radius[:n] = [body.radius for body in bodies]
+        return n
+
+    def forces(self, n, slack=0.0):
+        # All-pairs acceleration with the force law of calculate_gravitational_force, and the
+        # pairs that touch or are less than slack apart. Touching pairs still pull each other
+        # here, step_planets_numpy decides which of them merge
+        x, y = self.pos[:n, 0], self.pos[:n, 1]
+        mass, radius = self.mass[:n], self.radius[:n]
+        acc = self.acc[:n]
+        contacts = []
+        for start in range(0, n, self.BLOCK):
+            stop = min(start + self.BLOCK, n)
+            rows = np.arange(stop - start)
+            dx = x[None, :] - x[start:stop, None]
+            dy = y[None, :] - y[start:stop, None]
+            dist_squared = dx * dx + dy * dy
+            reach = radius[start:stop, None] + radius[None, :]
+            reach += slack
+            near = dist_squared <= reach * reach
+            near[rows, rows + start] = False  # A planet does not touch itself
+            coincident = dist_squared == 0
+            dist_squared[coincident] = 1.0
+            # a = G * m_j / d**1.75 along the unit vector, so (x_j - x_i) / d**2.75
+            # d**2.75 is built from square roots, they are much cheaper than a float power
+            root = np.sqrt(np.sqrt(dist_squared))
+            scale = np.sqrt(root, out=dx)
+            scale *= root
+            scale *= dist_squared
+            np.divide(mass[None, :], scale, out=scale)
+            scale[coincident] = 0.0
+            # sum_j s_ij * (x_j - x_i) == s @ x - x_i * sum_j s_ij
+            total = scale.sum(axis=1)
+            acc[start:stop, 0] = scale @ x - x[start:stop] * total
+            acc[start:stop, 1] = scale @ y - y[start:stop] * total
+            hit_i, hit_j = np.nonzero(near)
+            contacts.extend(zip((hit_i + start).tolist(), hit_j.tolist()))
+        acc *= GRAVITY_CONSTANT
+        return acc, contacts
+
+    def barnes_hut_forces(self, n, theta, slack=0.0):
+        x, y = self.pos[:n, 0], self.pos[:n, 1]
+        mass, radius = self.mass[:n], self.radius[:n]
+        tree = QuadTree(x, y, mass, radius)
+        acc_x, acc_y, contacts = tree.accelerations(x, y, radius + slack, 2.75, theta, self_query=True)
+        if contacts:
+            # The tree leaves the pairs within reach out of the sums, they pull like in forces()
+            i, j = np.array(contacts).T
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            dist = np.hypot(dx, dy)
+            keep = dist > 0
+            i, j, dx, dy, dist = i[keep], j[keep], dx[keep], dy[keep], dist[keep]
+            scale = mass[j] / dist ** 2.75
+            acc_x += np.bincount(i, weights=dx * scale, minlength=n)
+            acc_y += np.bincount(i, weights=dy * scale, minlength=n)
+        acc = self.acc[:n]
+        acc[:, 0] = acc_x * GRAVITY_CONSTANT
+        acc[:, 1] = acc_y * GRAVITY_CONSTANT
+        return acc, contacts
+
+def spread_bits(v):
+    # Put a zero bit between each of the low 16 bits of v, used to build Morton codes
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+def expand_ranges(owner, first, last):
+    # Turn (owner, [first, last)) ranges into one (owner, index) pair per element
+    counts = last - first
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(owner, counts), np.repeat(first, counts) + offsets
+
+class QuadTree:
+    # Barnes-Hut quadtree, rebuilt from scratch every tick. Bodies are sorted by Morton code so
+    # every cell at every level is a contiguous run of the sorted bodies, which lets the whole
+    # tree be built and walked with array operations instead of one python call per node
+    MAX_DEPTH = 12
+    LEAF_SIZE = 16
+
+    def __init__(self, x, y, mass, radius):
+        n = len(x)
+        left, top = x.min(), y.min()
+        size = max(x.max() - left, y.max() - top, 1.0) * 1.0001
+        depth = min(self.MAX_DEPTH, max(1, math.ceil(math.log(max(n / self.LEAF_SIZE, 1), 4)) + 1))
+        cells = 1 << depth
+        ix = np.minimum(((x - left) / size * cells).astype(np.int64), cells - 1)
+        iy = np.minimum(((y - top) / size * cells).astype(np.int64), cells - 1)
+        code = spread_bits(ix) | (spread_bits(iy) << 1)
+        self.order = np.argsort(code, kind="stable")
+        code = code[self.order]
+        ix, iy = ix[self.order], iy[self.order]
+        self.x, self.y = x[self.order], y[self.order]
+        self.mass, self.radius = mass[self.order], radius[self.order]
+
+        # One entry per level: first/last body of each occupied cell, mass, centre of mass,
+        # geometric centre, how far from the centre a body in the cell can reach, the distance
+        # between the centre of mass and the geometric centre, and the cell size
+        self.levels = []
+        for level in range(depth + 1):
+            shift = depth - level
+            key = code >> (2 * shift)
+            start = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+            stop = np.r_[start[1:], n]
+            cell_mass = np.add.reduceat(self.mass, start)
+            com_x = np.add.reduceat(self.mass * self.x, start) / cell_mass
+            com_y = np.add.reduceat(self.mass * self.y, start) / cell_mass
+            half = size / (1 << level) / 2
+            center_x = left + ((ix[start] >> shift) * 2 + 1) * half
+            center_y = top + ((iy[start] >> shift) * 2 + 1) * half
+            reach = np.maximum.reduceat(self.radius, start) + half * math.sqrt(2)
+            offset = np.hypot(com_x - center_x, com_y - center_y)
+            self.levels.append((start, stop, cell_mass, com_x, com_y, center_x, center_y, reach, offset, 2 * half))
+
+    def accelerations(self, qx, qy, qr, power, theta, self_query=False):
+        # Sum of m * (p - q) / |p - q|**power over all bodies p for every query point q.
+        # The walk goes down the tree for groups of queries at once: with self_query each leaf of
+        # the tree is a group, otherwise every query is a group of its own. A cell is used as a
+        # single body when, seen from anywhere in the group, its size over the distance to its
+        # centre of mass (less how far that is off the cell centre) is below theta and nothing
+        # in it can touch a query circle. Touching pairs always end up in the exact leaf sums
+        # and are reported as contacts, sorted like the exact loop
+        count = len(qx)
+        acc_x = np.zeros(count)
+        acc_y = np.zeros(count)
+        exponent = power / 2
+        if self_query:
+            # Groups are the circles around the queries in each leaf
+            members = self.order
+            group_first, group_last = self.levels[-1][:2]
+            size = group_last - group_first
+            x, y = qx[members], qy[members]
+            group_x = np.add.reduceat(x, group_first) / size
+            group_y = np.add.reduceat(y, group_first) / size
+            group_radius = np.maximum.reduceat(np.hypot(x - np.repeat(group_x, size), y - np.repeat(group_y, size)),
+                                               group_first)
+            group_reach = np.maximum.reduceat(qr[members], group_first) + group_radius
+        else:
+            members = np.arange(count)
+            group_first, group_last = members, members + 1
+            group_x, group_y = qx, qy
+            group_radius = np.zeros(count)
+            group_reach = qr
+        g = np.arange(len(group_first))
+        c = np.zeros(len(g), dtype=np.int64)
+        for level, (start, stop, cell_mass, com_x, com_y, center_x, center_y, reach, offset, width) in enumerate(self.levels):
+            x, y = group_x[g], group_y[g]
+            dx = com_x[c] - x
+            dy = com_y[c] - y
+            gap_x = center_x[c] - x
+            gap_y = center_y[c] - y
+            touch = reach[c] + group_reach[g]
+            opening = width / theta + offset[c] + group_radius[g]
+            far = (gap_x * gap_x + gap_y * gap_y > touch * touch) & (dx * dx + dy * dy > opening * opening)
+            if far.any():
+                # Every query in the group gets the cell's pull
+                cell, k = expand_ranges(c[far], group_first[g[far]], group_last[g[far]])
+                q = members[k]
+                dx = com_x[cell] - qx[q]
+                dy = com_y[cell] - qy[q]
+                scale = cell_mass[cell] / (dx * dx + dy * dy) ** exponent
+                acc_x += np.bincount(q, weights=dx * scale, minlength=count)
+                acc_y += np.bincount(q, weights=dy * scale, minlength=count)
+            near = ~far
+            g, c = g[near], c[near]
+            if level == len(self.levels) - 1:
+                break
+            child_start = self.levels[level + 1][0]
+            g, c = expand_ranges(g, np.searchsorted(child_start, start[c]), np.searchsorted(child_start, stop[c]))
+
+        # Exact sums of every query in a group against every body in the leaves it opened
+        g, b = expand_ranges(g, start[c], stop[c])
+        b, k = expand_ranges(b, group_first[g], group_last[g])
+        q = members[k]
+        if self_query:
+            keep = q != self.order[b]
+            q, b = q[keep], b[keep]
+        dx = self.x[b] - qx[q]
+        dy = self.y[b] - qy[q]
+        dist_squared = dx * dx + dy * dy
+        touch = qr[q] + self.radius[b]
+        touching = dist_squared <= touch * touch
+        pull = ~touching & (dist_squared > 0)
+        scale = self.mass[b[pull]] / dist_squared[pull] ** exponent
+        acc_x += np.bincount(q[pull], weights=dx[pull] * scale, minlength=count)
+        acc_y += np.bincount(q[pull], weights=dy[pull] * scale, minlength=count)
+        hit_q, hit_b = q[touching], self.order[b[touching]]
+        hits = np.lexsort((hit_b, hit_q))
+        contacts = list(zip(hit_q[hits].tolist(), hit_b[hits].tolist()))
+        return acc_x, acc_y, contacts
+
+def step_planets_numpy(planets, to_remove, time_scale=TIME_SCALE, arrays=None, theta=None, tick_scale=1.0):
+    # Batched version of step_planets_python. The forces of all pairs are summed at once from
+    # the positions at the start of the tick, then resolve_planets moves the planets one at a
+    # time in list order like the reference loop, so merges and removals come out the same.
+    # The summed forces don't see the planets that already moved this tick, so positions match
+    # the reference loop within a small tolerance rather than exactly.
+    # With a theta the forces come from a Barnes-Hut quadtree once there are enough planets
+    global PLANET_ARRAYS
+    if arrays is None:
+        if PLANET_ARRAYS is None:
+            PLANET_ARRAYS = PlanetArrays()
+        arrays = PLANET_ARRAYS
+    alive = [i for i in range(len(planets)) if i not in to_remove]
+    bodies = [planets[i] for i in alive]
+    n = arrays.load(bodies)
+    if n == 0:
+        return
+    # Pairs further apart than the planets can move this tick can't touch, they are not tested
+    speed = float(np.hypot(arrays.vel[:n, 0], arrays.vel[:n, 1]).max())
+    reach = 2 * (speed + arrays.last_acceleration * tick_scale) * time_scale + 1.0
+    result = None
+    while result is None:
+        if theta is not None and n >= BARNES_HUT_MIN_BODIES:
+            acc, near = arrays.barnes_hut_forces(n, theta, reach)
+        else:
+            acc, near = arrays.forces(n, reach)
+        arrays.last_acceleration = float(np.hypot(acc[:, 0], acc[:, 1]).max())
+        result = resolve_planets(arrays, n, acc, near, reach, time_scale, tick_scale)
+        reach *= 2  # Something moved further than that, try again with more pairs
+    x, y, vx, vy, mass, radius, gone, merged = result
+
+    # Write the new state back to the planet objects
+    for k, body in enumerate(bodies):
+        if k in gone:
+            to_remove.add(alive[k])
+            continue
+        body.x, body.y = x[k], y[k]
+        body.velocity[0], body.velocity[1] = vx[k], vy[k]
+        if k in merged:
+            body.mass = mass[k]
+            body.radius = radius[k]
+            body.refresh_glow()
+
+def resolve_planets(arrays, n, acc, near, reach, time_scale, tick_scale):
+    # The one planet at a time part of step_planets_numpy, with the rules of step_planets_python.
+    # Each planet is tested for contact against its near pairs at the positions and sizes they
+    # have by now, and the first one it touches wins. Every planet takes its summed force,
+    # corrected whenever a planet before it merged or was removed, and a planet that touches
+    # something only counts the planets before that one like the reference loop.
+    # Returns None when a planet moved more than reach / 2, a touching pair could be missing
+    start_x, start_y = arrays.pos[:n, 0], arrays.pos[:n, 1]
+    acc_x, acc_y = acc[:, 0].copy(), acc[:, 1].copy()
+    x, y = start_x.tolist(), start_y.tolist()
+    vx, vy = arrays.vel[:n, 0].tolist(), arrays.vel[:n, 1].tolist()
+    mass, radius = arrays.mass[:n].tolist(), arrays.radius[:n].tolist()
+    pulling_mass = arrays.mass[:n].copy()  # The mass each planet pulls with in acc_x and acc_y
+    partners = {}
+    for i, j in near:
+        partners.setdefault(i, []).append(j)
+    gone = set()
+    merged = set()
+    fastest = 0.0
+
+    def pull(k, mass_change, first):
+        # Change the pull of planet k on the planets from first on
+        if first < n:
+            dx = start_x[k] - start_x[first:]
+            dy = start_y[k] - start_y[first:]
+            dist_squared = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scale = np.where(dist_squared > 0, GRAVITY_CONSTANT * mass_change / dist_squared ** 1.375, 0.0)
+            acc_x[first:] += scale * dx
+            acc_y[first:] += scale * dy
+        pulling_mass[k] += mass_change
+
+    for i in range(n):
+        if i in gone:
+            continue
+        contact = None
+        for j in sorted(partners.get(i, ())):
+            if j not in gone and math.sqrt((x[j] - x[i])**2 + (y[j] - y[i])**2) <= radius[i] + radius[j]:
+                contact = j
+                break
+        if contact is None:
+            vx[i] += float(acc_x[i]) * tick_scale
+            vy[i] += float(acc_y[i]) * tick_scale
+        else:
+            # The reference loop stops summing at the planet it touches, take the rest back out
+            j = contact
+            dx = start_x[j:] - start_x[i]
+            dy = start_y[j:] - start_y[i]
+            dist_squared = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scale = np.where(dist_squared > 0, GRAVITY_CONSTANT * pulling_mass[j:] / dist_squared ** 1.375, 0.0)
+            vx[i] += float(acc_x[i] - scale @ dx) * tick_scale
+            vy[i] += float(acc_y[i] - scale @ dy) * tick_scale
+            if mass[i] / mass[j] > 1.25 or mass[i] / mass[j] < 0.8:
+                # Same arithmetic as merge_planets
+                total_mass = mass[i] + mass[j]
+                velocity = ((mass[i] * vx[i] + mass[j] * vx[j]) / total_mass,
+                            (mass[i] * vy[i] + mass[j] * vy[j]) / total_mass)
+                bigger, smaller = (i, j) if mass[i] > mass[j] else (j, i)
+                mass[bigger] = total_mass
+                vx[bigger], vy[bigger] = velocity
+                radius[bigger] = ((total_mass ** (3 / 4)) * PLANET_RADIUS_SCALE)
+                merged.add(bigger)
+                gone.add(smaller)
+                pull(smaller, -pulling_mass[smaller], i + 1)
+                pull(bigger, total_mass - pulling_mass[bigger], i + 1)
+                # The bigger planet reaches further now
+                dx = start_x - start_x[bigger]
+                dy = start_y - start_y[bigger]
+                limit = radius[bigger] + np.array(radius) + reach
+                for k in np.flatnonzero(dx * dx + dy * dy <= limit * limit).tolist():
+                    if k != bigger:
+                        partners.setdefault(bigger, []).append(k)
+                        partners.setdefault(k, []).append(bigger)
+            else:
+                gone.add(i)
+                gone.add(j)
+                pull(i, -pulling_mass[i], i + 1)
+                pull(j, -pulling_mass[j], i + 1)
+        if i not in gone:
+            x[i] += vx[i] * time_scale
+            y[i] += vy[i] * time_scale
+            fastest = max(fastest, vx[i] * vx[i] + vy[i] * vy[i])
+            if x[i] < -radius[i] or x[i] > WIDTH + radius[i] or y[i] < -radius[i] or y[i] > HEIGHT + radius[i]:
+                gone.add(i)
+                pull(i, -pulling_mass[i], i + 1)
+    if math.sqrt(fastest) * time_scale > reach / 2:
+        return None
+    return x, y, vx, vy, mass, radius, gone, merged
+
+PLANET_ARRAYS = None
+
+def swept_contact(x1, y1, dx1, dy1, x2, y2, dx2, dy2, reach):
+    # Two circles start at (x1, y1) and (x2, y2) and move by (dx1, dy1) and (dx2, dy2) during the
+    # tick. Returns the fraction of the tick (0 to 1) at which their centres first come within
+    # reach of each other, or None if they never do. Catches fast objects that would jump
+    # over each other between two end of tick tests
+    px, py = x1 - x2, y1 - y2
+    vx, vy = dx1 - dx2, dy1 - dy2
+    c = px * px + py * py - reach * reach
+    if c < 0:
+        return 0.0  # Already touching
+    b = px * vx + py * vy
+    if b >= 0:
+        return None  # Not getting any closer
+    a = vx * vx + vy * vy
+    discriminant = b * b - a * c
+    if discriminant < 0:
+        return None  # Closest approach is still out of reach
+    t = (-b - math.sqrt(discriminant)) / a
+    return t if t <= 1 else None
+
+def swept_circle(x0, y0, x1, y1, radius):
+    # Circle around everything a moving circle covers in a tick, for the broad phase
+    dx, dy = x1 - x0, y1 - y0
+    return (x0 + x1) / 2, (y0 + y1) / 2, radius + math.sqrt(dx * dx + dy * dy) / 2
+
+class SpatialHash:
+    # Uniform grid broad phase. Every circle is stored in each cell its bounding box covers, so
+    # two circles can only touch if they share a cell and only those pairs need check_collision
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.count = 0
+
+    def clear(self, cell_size=None):
+        if cell_size is not None:
+            self.cell_size = cell_size
+        self.cells.clear()
+        self.count = 0
+
+    def cell_range(self, x, y, radius):
+        size = self.cell_size
+        return (int((x - radius) // size), int((x + radius) // size),
+                int((y - radius) // size), int((y + radius) // size))
+
+    def insert(self, item, x, y, radius):
+        entry = (self.count, item)  # Insertion number keeps query results in a stable order
+        self.count += 1
+        left, right, top, bottom = self.cell_range(x, y, radius)
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                self.cells.setdefault((cx, cy), []).append(entry)
+
+    def query(self, x, y, radius):
+        # Everything sharing a cell with the circle, in insertion order
+        found = {}
+        left, right, top, bottom = self.cell_range(x, y, radius)
+        for cx in range(left, right + 1):
+            for cy in range(top, bottom + 1):
+                for number, item in self.cells.get((cx, cy), ()):
+                    found[number] = item
+        return [found[number] for number in sorted(found)]
@@ -0,0 +1,98 @@
+# The Gravitroids replay file: magic, version and section sizes, a JSON header, the zlib
+# compressed per-tick input and the zlib compressed state keyframes. The game records and
+# plays the replays, this module only reads and writes them
+import json
+import struct
+import zlib
+
+REPLAY_MAGIC = b"GRVR"
+REPLAY_VERSION = 2  # 1 stored the keyframes as JSON, it can still be read
+RNG_WORDS = 625  # Length of the Mersenne Twister state that random.Random.getstate() returns
+MAX_SHOTS = 7  # Shots a tick can hold, the game fires any more on the following ticks
+MAX_CLICKS = 255  # Right clicks a tick can hold
+
+def pack_keyframe(tick, offset, state):
+    # A keyframe as bytes: tick, input offset and the generator state as uint32 words, then the
+    # rest of the state as JSON. The generator state is random and doesn't compress, as JSON
+    # numbers it took several times the space
+    version, internal, gauss_next = state["rng"]
+    rest = json.dumps([version, gauss_next, state["player"], state["planets"]]).encode()
+    return struct.pack(f"<III{RNG_WORDS}I", tick, offset, len(rest), *internal) + rest
+
+def unpack_keyframes(data):
+    # The (tick, offset, state) list back from the pack_keyframe() records
+    keyframes = []
+    start = 0
+    header = struct.Struct(f"<III{RNG_WORDS}I")
+    while start < len(data):
+        tick, offset, size, *internal = header.unpack_from(data, start)
+        start += header.size
+        version, gauss_next, player_state, planets_state = json.loads(data[start:start + size])
+        start += size
+        keyframes.append((tick, offset, {"rng": (version, internal, gauss_next), "player": player_state,
+                                         "planets": planets_state}))
+    return keyframes
+
+def encode_tick(controls, placed):
+    # One flag byte per tick: left, right, up, the shots fired, then whether right clicks during
+    # the tick and right clicks made while paused (applied before the tick) follow as int16 pairs.
+    # A tick fires at most MAX_SHOTS and Controls.next_tick() carries the rest over, so that is
+    # all a tick records. Clicks that don't fit would not play back the same, they raise ValueError
+    if max(len(controls.spawns), len(placed)) > MAX_CLICKS:
+        raise ValueError(f"more than {MAX_CLICKS} right clicks in one tick")
+    flags = (int(bool(controls.left)) | int(bool(controls.right)) << 1 | int(bool(controls.up)) << 2 |
+             min(controls.shots, MAX_SHOTS) << 3 | int(bool(controls.spawns)) << 6 | int(bool(placed)) << 7)
+    data = bytearray([flags])
+    for clicks in (controls.spawns, placed):
+        if clicks:
+            data.append(len(clicks))
+            for x, y in clicks:
+                data += struct.pack("<hh", x, y)
+    return data
+
+def decode_tick(data, offset):
+    # Returns the Controls arguments (left, right, up, shots, right clicks), the paused right
+    # clicks and the offset of the next tick
+    flags = data[offset]
+    offset += 1
+    clicks = []
+    for present in (flags & 64, flags & 128):
+        points = []
+        if present:
+            count = data[offset]
+            offset += 1
+            for _ in range(count):
+                points.append(struct.unpack_from("<hh", data, offset))
+                offset += 4
+        clicks.append(points)
+    return (bool(flags & 1), bool(flags & 2), bool(flags & 4), (flags >> 3) & 7, clicks[0]), clicks[1], offset
+
+def write_replay(path, header, inputs, keyframes):
+    # header is a JSON-friendly dict, inputs the encode_tick() bytes and keyframes a list of
+    # (tick, input offset, state)
+    header = json.dumps(header).encode()
+    keyframes = zlib.compress(b"".join(pack_keyframe(*keyframe) for keyframe in keyframes))
+    inputs = zlib.compress(bytes(inputs))
+    with open(path, "wb") as f:
+        f.write(REPLAY_MAGIC + struct.pack("<BIII", REPLAY_VERSION, len(header), len(inputs), len(keyframes)))
+        f.write(header)
+        f.write(inputs)
+        f.write(keyframes)
+
+def read_replay(path):
+    # Returns the header, inputs and keyframes that write_replay() was given
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != REPLAY_MAGIC:
+        raise ValueError(f"{path} is not a Gravitroids replay")
+    version, header_size, inputs_size, keyframes_size = struct.unpack_from("<BIII", data, 4)
+    if version not in (1, REPLAY_VERSION):
+        raise ValueError(f"{path} is a version {version} replay, expected {REPLAY_VERSION}")
+    start = 4 + struct.calcsize("<BIII")
+    header = json.loads(data[start:start + header_size])
+    start += header_size
+    inputs = zlib.decompress(data[start:start + inputs_size])
+    start += inputs_size
+    keyframes = zlib.decompress(data[start:start + keyframes_size])
+    keyframes = json.loads(keyframes) if version == 1 else unpack_keyframes(keyframes)
+    return header, inputs, keyframes
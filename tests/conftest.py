@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import Gravitroids as game
+
+
+@pytest.fixture
+def headless():
+    # Every test starts from headless defaults, call the fixture with options to change them.
+    # Replays and options change module settings, the defaults are put back afterwards
+    def configure(*args):
+        game.configure(game.parser.parse_args(["--headless", *args]))
+        game.init_display()
+    configure()
+    yield configure
+    game.configure(game.parser.parse_args([]))
@@ -0,0 +1,53 @@
+import Gravitroids as game
+
+
+def test_a_shot_costs_two_points_and_a_hit_gives_ten(headless, monkeypatch):
+    monkeypatch.setattr(game, "MAX_PLANETS", 1)  # No planets spawn besides the target
+    game.reset_game()
+    game.player.points = 10
+    game.planets.append(game.planet_pool.new(x=game.player.x + 200, y=game.player.y, mass=10,
+                                             velocity=[0, 0], color=(200, 200, 200)))
+    assert game.simulate_tick(game.Controls(shots=1)) is None
+    assert game.player.points == 8
+    for _ in range(100):
+        if game.player.splits:
+            break
+        assert game.simulate_tick(game.Controls()) is None
+    assert game.player.points == 18
+    assert len(game.planets) == 2
+
+
+def test_leaving_the_screen_costs_forty_points(headless):
+    game.reset_game()
+    game.player.points = 100
+    game.player.x = -1
+    game.simulate_tick(game.Controls())
+    assert game.player.points == 60
+    assert (game.player.x, game.player.y) == (game.WIDTH // 2, game.HEIGHT // 2)
+
+
+def test_running_out_of_points_ends_the_run(headless):
+    game.reset_game()
+    game.player.points = 0
+    game.planets.append(game.spawn_planet(100, 100))
+    assert game.simulate_tick(game.Controls()) == "points"
+
+
+def run_with_grid(monkeypatch, min_pairs):
+    monkeypatch.setattr(game, "BROAD_PHASE_MIN_PAIRS", min_pairs)
+    game.game_rng.seed(7)
+    game.reset_game()
+    game.player.points = 1000
+    result = []
+    for tick in range(1500):
+        death = game.simulate_tick(game.Controls(left=tick % 90 < 20, up=tick % 50 < 10, shots=tick % 4 == 0))
+        result.append((death, game.player.points, game.player.splits, len(game.planets)))
+        if death:
+            game.reset_game()
+            game.player.points = 1000
+    result.append([(planet.x, planet.y, planet.mass) for planet in game.planets])
+    return result
+
+
+def test_grid_gives_the_same_hits_as_checking_every_pair(headless, monkeypatch):
+    assert run_with_grid(monkeypatch, 0) == run_with_grid(monkeypatch, 10**9)
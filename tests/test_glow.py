@@ -0,0 +1,35 @@
+import pygame
+import pytest
+
+import Gravitroids as game
+
+
+@pytest.mark.parametrize("glow_radius, step", [(1, 1), (9, 1), (20, 2), (33, 3)])
+def test_array_fill_matches_the_pixel_loop(headless, monkeypatch, glow_radius, step):
+    pytest.importorskip("numpy")
+    color = (250, 40, 130)
+    filled = game.build_glow_texture(glow_radius, color, step)
+    monkeypatch.setattr(game, "np", None)
+    looped = game.build_glow_texture(glow_radius, color, step)
+    assert pygame.image.tobytes(filled, "RGBA") == pygame.image.tobytes(looped, "RGBA")
+
+
+def test_close_planets_share_a_texture(headless):
+    cache = game.GlowCache()
+    first = cache.get(40, (96, 96, 96), 10)
+    assert cache.get(41, (98, 94, 99), 12) is first
+    assert cache.get(40, (96, 96, 96), 200) is not first  # Heavier planets are drawn coarser
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_textures_are_dropped_first(headless):
+    size = 20 * 20 * 4  # A glow radius of 10
+    cache = game.GlowCache(max_bytes=3 * size)
+    colors = [(8 * i, 0, 0) for i in range(4)]
+    textures = [cache.get(20, color, 10) for color in colors[:3]]
+    assert cache.get(20, colors[0], 10) is textures[0]  # The first colour is now the most recent
+    cache.get(20, colors[3], 10)
+    assert cache.evictions == 1 and cache.bytes == 3 * size
+    assert cache.get(20, colors[0], 10) is textures[0]
+    assert cache.get(20, colors[1], 10) is not textures[1]  # Built again
+    assert cache.bytes <= cache.max_bytes
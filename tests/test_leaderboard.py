@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+import Gravitroids as game
+
+
+@pytest.fixture
+def board(tmp_path):
+    board = game.Leaderboard(str(tmp_path / "leaderboard.db"))
+    yield board
+    board.close()
+
+
+def fill(board, runs=2000, seed=0):
+    rng = random.Random(seed)
+    names = [f"player{i}" for i in range(20)]
+    rows = [(rng.choice(names), rng.randrange(-40, 300), rng.choice(("collision", "points")), 10.0, 5, 2, 0)
+            for _ in range(runs)]
+    board.record_many(rows)
+    return rows
+
+
+def test_rank_counts_the_runs_with_a_higher_score(board):
+    rows = fill(board)
+    board.record("player3", 150, "collision", 30.0, 12, 4)
+    scores = [row[1] for row in rows] + [150]
+    for points in (-100, -40, 0, 1, 150, 299, 300, 1000):
+        assert board.rank(points) == (1 + sum(score > points for score in scores), len(scores))
+
+
+def test_score_counts_survive_reopening(board):
+    fill(board, 500)
+    board.close()
+    fill(board, 500, seed=1)  # Opens the same file again
+    counted, = board.connect().execute("SELECT SUM(runs) FROM score_counts").fetchone()
+    assert counted == 1000
+    assert board.rank(-1000) == (1001, 1000)
+
+
+def test_top_best_and_recent(board):
+    rows = fill(board, 300)
+    assert [points for name, points in board.top(10)] == sorted((row[1] for row in rows), reverse=True)[:10]
+    assert board.best("player7") == max(row[1] for row in rows if row[0] == "player7")
+    assert board.best("nobody") is None
+    board.record("last", 42, "points", 3.5, 1, 0)
+    assert board.recent(2) == [("last", 42, "points", 3.5), tuple(rows[-1][:3]) + (10.0,)]
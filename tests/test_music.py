@@ -0,0 +1,48 @@
+import pytest
+
+import Gravitroids as game
+
+
+@pytest.fixture
+def music(headless):
+    # No tier playing and no music tracks decoded
+    for path in game.music_tracks.values():
+        game.assets.get(path)  # Waits for a loader thread a previous test may have started
+        game.assets.release(path)
+    game.current_music_level = None
+    game.pending_music_level = None
+    yield
+    game.current_music_level = None
+    game.pending_music_level = None
+
+
+def decoded_levels():
+    return {level for level, path in game.music_tracks.items() if game.assets.peek(path) is not None}
+
+
+def test_switch_waits_for_the_track_and_is_not_lost(music):
+    game.update_music(0)
+    assert game.current_music_level is None and game.pending_music_level == "low"
+    game.assets.get(game.music_tracks["low"])  # The loader thread finishes
+    game.switch_music()  # The next frame, the points have not changed
+    assert game.current_music_level == "low" and game.pending_music_level is None
+
+
+def test_only_the_playing_and_pending_tiers_stay_decoded(music):
+    for points in (0, 60, 120, 60, 0):
+        game.update_music(points)
+        assert decoded_levels() <= {game.current_music_level, game.pending_music_level}
+        game.assets.get(game.music_tracks[game.pending_music_level])
+        game.switch_music()
+        assert decoded_levels() == {game.current_music_level}
+
+
+def test_pending_tier_follows_the_score(music):
+    game.update_music(60)
+    game.update_music(120)  # The score moved on before the mid tier was decoded
+    assert game.pending_music_level == "high"
+    game.assets.get(game.music_tracks["mid"])
+    game.assets.get(game.music_tracks["high"])
+    game.switch_music()
+    assert game.current_music_level == "high"
+    assert decoded_levels() == {"high"}
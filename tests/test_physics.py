@@ -0,0 +1,123 @@
+import math
+
+import pytest
+
+import Gravitroids as game
+import physics
+
+
+def test_numpy_backend_removes_the_same_planets(headless):
+    pytest.importorskip("numpy")
+    bodies = game.make_benchmark_planets(128)
+    for tick in range(25):
+        reference, batched = game.copy_planets(bodies), game.copy_planets(bodies)
+        removed_reference, removed_batched = set(), set()
+        physics.step_planets_python(reference, removed_reference)
+        physics.step_planets_numpy(batched, removed_batched)
+        assert removed_reference == removed_batched, f"tick {tick}"
+        for k, (planet, other_planet) in enumerate(zip(reference, batched)):
+            if k not in removed_reference:
+                assert abs(planet.x - other_planet.x) + abs(planet.y - other_planet.y) < 1.0
+        bodies = [planet for k, planet in enumerate(reference) if k not in removed_reference]
+
+
+def orbit_energy(state, gm):
+    x, y, vx, vy = state
+    return (vx * vx + vy * vy) / 2 - gm / math.hypot(x, y)
+
+
+def point_mass(gm, radius):
+    def acceleration(x, y):
+        distance = math.hypot(x, y)
+        if distance < radius:
+            return None
+        scale = -gm / distance ** 3
+        return x * scale, y * scale
+    return acceleration
+
+
+@pytest.mark.parametrize("integrator", ["leapfrog", "adaptive"])
+def test_integrators_keep_the_energy_of_an_orbit(integrator):
+    gm, distance = 1000.0, 100.0
+    state = (distance, 0.0, 0.0, math.sqrt(gm / distance))
+    start = orbit_energy(state, gm)
+    step = physics.INTEGRATORS[integrator]
+    for _ in range(400):  # About two orbits
+        state = step(*state, 1.0, point_mass(gm, 10))
+    assert abs(orbit_energy(state, gm) - start) < 0.01 * abs(start)
+
+
+@pytest.mark.parametrize("integrator", ["euler", "leapfrog", "adaptive"])
+def test_integrators_stop_at_a_planet(integrator):
+    state = (-100.0, 0.0, 5.0, 0.0)
+    step = physics.INTEGRATORS[integrator]
+    for _ in range(40):
+        state = step(*state, 1.0, point_mass(10.0, 20))
+        if state is None:
+            break
+    assert state is None
+
+
+def test_adaptive_step_covers_the_whole_step(monkeypatch):
+    # The first whole substep and its first half land in a thin planet, the shortest substeps
+    # go around it. The step must still end dt later, not after the substep that went around
+    monkeypatch.setattr(physics, "ADAPTIVE_MAX_DEPTH", 1)
+
+    def acceleration(x, y):
+        return None if abs(x - 0.25) < 0.05 else (0.0, 0.0)
+    x, y, vx, vy = physics.adaptive_step(0.0, 0.0, 1.0, 0.0, 1.0, acceleration)
+    assert x == pytest.approx(1.0) and vx == 1.0
+
+
+def test_barnes_hut_forces_match_exact_summation():
+    np = pytest.importorskip("numpy")
+    bodies = game.make_benchmark_planets(1024)
+    arrays = physics.PlanetArrays()
+    n = arrays.load(bodies)
+    exact, _ = arrays.forces(n)
+    opened, _ = arrays.barnes_hut_forces(n, 1e-9)  # Every cell is opened down to the planets
+    assert np.allclose(opened, exact, rtol=1e-9, atol=1e-12)
+    approximate, _ = arrays.barnes_hut_forces(n, game.BARNES_HUT_THETA)
+    error = np.hypot(*(approximate - exact).T) / np.hypot(*exact.T)
+    assert np.median(error) < 0.02
+
+
+def test_barnes_hut_player_field_matches_exact_summation(headless):
+    pytest.importorskip("numpy")
+    planets = game.copy_planets(game.make_benchmark_planets(512))
+    player = game.Player(game.WIDTH / 3, game.HEIGHT / 3, 0, 15)
+    exact_x, exact_y = player.gravity_field(planets)(player.x, player.y)
+    tree_x, tree_y = game.barnes_hut_player_field(player, planets, theta=1e-9)(player.x, player.y)
+    assert math.hypot(tree_x - exact_x, tree_y - exact_y) < 1e-9 * math.hypot(exact_x, exact_y)
+
+
+def test_swept_contact_time_of_impact():
+    assert physics.swept_contact(0, 0, 100, 0, 50, 0, 0, 0, 10) == pytest.approx(0.4)
+    assert physics.swept_contact(0, 0, 50, 0, 100, 0, -50, 0, 10) == pytest.approx(0.9)  # Both moving
+    assert physics.swept_contact(0, 0, 100, 0, 50, 20, 0, 0, 10) is None  # Passes by out of reach
+    assert physics.swept_contact(0, 0, 100, 0, 150, 0, 0, 0, 10) is None  # Would touch after the tick
+    assert physics.swept_contact(0, 0, -100, 0, 50, 0, 0, 0, 10) is None  # Moving away
+    assert physics.swept_contact(0, 0, 100, 0, 5, 0, 0, 0, 10) == 0.0  # Already touching
+
+
+def test_swept_circle_covers_the_whole_movement():
+    x, y, radius = physics.swept_circle(0, 0, 30, 40, 5)
+    for t in (0, 0.25, 0.5, 1):
+        assert math.hypot(30 * t - x, 40 * t - y) + 5 <= radius + 1e-9
+
+
+@pytest.mark.parametrize("collisions, hits", [("discrete", 0), ("swept", 1)])
+def test_fast_bullets_only_split_small_planets_when_swept(headless, monkeypatch, collisions, hits):
+    headless("--collisions", collisions)
+    monkeypatch.setattr(game, "MAX_PLANETS", 1)
+    game.reset_game()
+    game.player.points = 100
+    game.player.bullets.speed = 40  # Further per tick than the bullet and planet radii together
+    game.simulate_tick(game.Controls(shots=1))
+    start = game.player.bullets.x[0]
+    game.planets.append(game.planet_pool.new(x=start + 3 * 40 + 20, y=game.player.y, mass=4, velocity=[0, 0],
+                                             color=(200, 200, 200)))
+    assert game.planets[0].radius + game.player.bullets.radius < 20
+    for _ in range(8):
+        assert game.simulate_tick(game.Controls()) is None
+    assert game.player.splits == hits
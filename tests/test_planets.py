@@ -0,0 +1,34 @@
+import Gravitroids as game
+
+
+def new_planet(x=300):
+    return game.planet_pool.new(x=x, y=300, mass=20, velocity=[0, 0], color=(200, 200, 200))
+
+
+def test_handle_of_a_released_planet_stops_resolving(headless):
+    pool = game.PlanetPool()
+    planet = pool.new(x=300, y=300, mass=20, velocity=[0, 0], color=(200, 200, 200))
+    handle = pool.handle(planet)
+    assert pool.get(handle) is planet
+    pool.release(planet)
+    assert pool.get(handle) is None
+    reused = pool.new(x=500, y=500, mass=5, velocity=[1, 1], color=(100, 100, 100))
+    assert reused is planet and pool.reused == 1
+    assert pool.get(handle) is None  # Still gone once the object is back in the game
+    assert pool.get(pool.handle(reused)) is reused
+    assert pool.get(None) is None
+
+
+def test_split_planets_are_released_and_reused(headless):
+    game.reset_game()
+    target, other = new_planet(), new_planet(900)
+    game.planets.extend([target, other])
+    selected, kept = game.planet_pool.handle(target), game.planet_pool.handle(other)
+    game.planets.extend(target.split(0))
+    game.remove_planets(game.planets, {0})
+    assert game.planets[0] is other and len(game.planets) == 3
+    assert game.planet_pool.get(selected) is None
+    assert game.planet_pool.get(kept) is other
+    created = game.planet_pool.created
+    assert new_planet() is target  # The split planet is the next one handed out
+    assert game.planet_pool.created == created
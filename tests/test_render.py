@@ -0,0 +1,56 @@
+import pygame
+import pytest
+
+import Gravitroids as game
+
+
+@pytest.fixture
+def window(headless, monkeypatch):
+    # A dummy window, headless runs have no fonts and build no glow textures
+    monkeypatch.setattr(game, "AUDIO", False)  # Put back after init_display() sets it
+    game.configure(game.parser.parse_args(["--render-scale", "1"]))
+    game.init_display()
+    yield
+    pygame.quit()
+
+
+def test_ship_sprites_are_kept_per_whole_degree(headless):
+    headless("--physics-rate", "240")  # Turns of 0.75 degrees
+    cache = game.SpriteCache()
+    player = game.Player(100, 100, 0, 15)
+    for _ in range(4 * 360 * 3):
+        player.turn_left()
+        cache.ship(player.angle, (255, 255, 255))
+    assert len(cache.sprites) == 360
+    assert cache.ship(90.4, (255, 255, 255)) is cache.ship(89.6, (255, 255, 255))
+
+
+def test_dirty_rects_draw_the_same_frames_as_flip(window, monkeypatch):
+    size = game.screen.get_size()
+    dirty_surface, full_surface = pygame.Surface(size), pygame.Surface(size)
+    dirty = game.DirtyRects()
+    full_frames = 1
+    game.game_rng.seed(2)
+    game.reset_game()
+    for x, y in ((300, 200), (1200, 300), (500, 700), (1000, 650)):
+        game.planets.append(game.spawn_planet(x, y))
+    for tick in range(150):
+        game.player.points = 1000  # Past the last gradient step, the background stays the same
+        background = game.gradient_color(game.player.points)
+        if game.simulate_tick(game.Controls(left=tick % 60 < 15, up=tick % 40 < 8, shots=tick % 5 == 0)):
+            game.reset_game()
+            dirty.invalidate()  # Like the death screen closing
+            full_frames += 1
+        for alpha in (0.0, 0.5):
+            for surface in (dirty_surface, full_surface):
+                monkeypatch.setattr(game, "screen", surface)
+                monkeypatch.setattr(game, "world_surface", surface)
+                if surface is dirty_surface:
+                    dirty.restore(surface, background)
+                    dirty.add(game.draw_world(alpha))
+                    dirty.present()
+                else:
+                    surface.fill(background)
+                    game.draw_world(alpha)
+            assert pygame.image.tobytes(dirty_surface, "RGB") == pygame.image.tobytes(full_surface, "RGB")
+    assert dirty.full_frames == full_frames
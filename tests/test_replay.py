@@ -0,0 +1,41 @@
+import pytest
+
+import Gravitroids as game
+
+
+def record(path, ticks, seed=0):
+    recorder = game.ReplayRecorder()
+    game.run_headless(ticks, seed, recorder=recorder)
+    recorder.save(path)
+    return game.Replay.load(path)
+
+
+@pytest.mark.parametrize("physics", ["python", "numpy"])
+@pytest.mark.parametrize("start", [0, game.KEYFRAME_INTERVAL + 100])
+def test_replay_ends_in_the_recorded_state(headless, tmp_path, physics, start):
+    if physics == "numpy":
+        pytest.importorskip("numpy")
+    headless("--physics", physics)
+    replay = record(tmp_path / "run.grvr", game.KEYFRAME_INTERVAL * 2 + 200, seed=3)
+    headless()  # Playback takes the backend from the file
+    assert game.fast_forward(replay, start)
+    assert game.PHYSICS_BACKEND == physics
+
+
+def test_shots_past_a_tick_are_fired_on_the_next_one(headless, tmp_path):
+    game.game_rng.seed(5)
+    game.reset_game()
+    game.player.points = 100
+    recorder = game.ReplayRecorder()
+    recorder.start(5)
+    controls = game.Controls(shots=10)
+    fired = []
+    for _ in range(3):
+        recorder.record(controls)
+        assert game.simulate_tick(controls) is None
+        controls = controls.next_tick()
+        recorder.end_tick()
+        fired.append(game.player.shots)
+    assert fired == [game.MAX_SHOTS, 10, 10]
+    recorder.save(tmp_path / "shots.grvr")
+    assert game.fast_forward(game.Replay.load(tmp_path / "shots.grvr"))
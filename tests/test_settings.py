@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+import Gravitroids as game
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(game, "SETTINGS_DEBOUNCE", 0.05)
+    return game.SettingsStore(str(tmp_path / "settings.json"))
+
+
+def wait_for_writer(store):
+    while store.thread is not None:
+        time.sleep(0.01)
+    with store.write_lock:
+        pass  # The writer has finished replacing the file
+
+
+def test_missing_keys_come_from_the_defaults(store):
+    assert not store.load()
+    with open(store.path, "w") as f:
+        json.dump({"player_name": "Ada", "scores": {"Ada": [{"points": 30, "time": 0}]}}, f)
+    assert store.load()
+    assert store["player_name"] == "Ada"
+    assert store["scores"] == {"Ada": [{"points": 30, "time": 0}]}
+    for key, value in game.default_settings.items():
+        if key not in ("player_name", "scores"):
+            assert store[key] == value
+
+
+@pytest.mark.parametrize("contents", ["[1, 2]", "not json", '{"scores": [3]}', '{"scores": {"Ada": 3}}'])
+def test_unusable_files_give_the_defaults(store, contents):
+    with open(store.path, "w") as f:
+        f.write(contents)
+    assert store.load()
+    assert store["scores"] == {}
+    store.record_score(20)  # The score history is usable again
+    assert store["max_score"] == max(game.default_settings["max_score"], 20)
+
+
+def test_changes_in_quick_succession_are_written_once(store, monkeypatch):
+    writes = []
+    write = store.write
+    monkeypatch.setattr(store, "write", lambda text, version: writes.append(version) or write(text, version))
+    for volume in range(10):
+        store.update(music_volume=volume / 10)
+    wait_for_writer(store)
+    assert writes == [10]
+    with open(store.path) as f:
+        assert json.load(f)["music_volume"] == 0.9
+
+
+def test_a_failed_write_leaves_the_old_file(store, monkeypatch):
+    store.update(player_name="Ada")
+    wait_for_writer(store)
+    def crash(fd):
+        raise OSError("disk full")
+    monkeypatch.setattr(game.os, "fsync", crash)
+    with pytest.raises(OSError):
+        store.write(json.dumps({"player_name": "Grace"}), store.version + 1)
+    with open(store.path) as f:
+        assert json.load(f)["player_name"] == "Ada"
+    monkeypatch.undo()
+    store.write(json.dumps({"player_name": "Grace"}), store.version + 1)
+    with open(store.path) as f:
+        assert json.load(f)["player_name"] == "Grace"
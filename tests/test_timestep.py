@@ -0,0 +1,41 @@
+import math
+
+import pytest
+
+import Gravitroids as game
+
+
+def one_second_of_thrust(headless, monkeypatch, rate):
+    # Where the player and a bullet fired at the start are after one second of game time
+    headless("--physics-rate", str(rate))
+    monkeypatch.setattr(game, "MAX_PLANETS", 0)
+    game.reset_game()
+    game.player.points = 1000
+    game.player.angle = 30
+    assert game.simulate_tick(game.Controls(up=True, shots=1)) is None
+    bullet = game.player.bullets.x[0], game.player.bullets.y[0]
+    for _ in range(rate - 1):
+        assert game.simulate_tick(game.Controls(up=True)) is None
+    bullets = game.player.bullets
+    moved = math.hypot(bullets.x[0] - bullet[0], bullets.y[0] - bullet[1])
+    return game.player.x, game.player.y, moved
+
+
+@pytest.mark.parametrize("rate", [30, 120, 240])
+def test_physics_rate_keeps_the_game_speed(headless, monkeypatch, rate):
+    x, y, moved = one_second_of_thrust(headless, monkeypatch, game.TICK_RATE)
+    rate_x, rate_y, rate_moved = one_second_of_thrust(headless, monkeypatch, rate)
+    assert math.hypot(rate_x - x, rate_y - y) < 0.05 * math.hypot(x - game.WIDTH // 2, y - game.HEIGHT // 2)
+    # The bullet moved for all but the first tick
+    assert moved == pytest.approx(game.BULLET_SPEED * (game.TICK_RATE - 1))
+    assert rate_moved == pytest.approx(game.BULLET_SPEED * game.TICK_RATE * (rate - 1) / rate)
+
+
+def test_replay_recorded_at_another_physics_rate(headless, tmp_path):
+    headless("--physics-rate", "120")
+    recorder = game.ReplayRecorder()
+    game.run_headless(game.KEYFRAME_INTERVAL + 300, 4, recorder=recorder)
+    recorder.save(tmp_path / "fast.grvr")
+    headless()  # Playback takes the rate from the file
+    assert game.fast_forward(game.Replay.load(tmp_path / "fast.grvr"))
+    assert game.TICK_SCALE == 0.5
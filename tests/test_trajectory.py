@@ -0,0 +1,37 @@
+import math
+
+import Gravitroids as game
+
+
+def slow_player_scene():
+    # A player at rest far from one light planet: the predicted path barely moves, so one tick
+    # further along it is within the on-path tolerance of where the player already is
+    player = game.Player(200, 200, 0, 15)
+    planet = game.Planet(1300, 700, 2, [0, 0], (200, 200, 200), "Test")
+    return player, [planet]
+
+
+def test_frames_without_a_tick_get_the_same_path(headless):
+    player, planets = slow_player_scene()
+    predictor = game.TrajectoryPredictor(game.PREDICTION_STEPS, game.PREDICTION_DT)
+    points, hit = predictor.predict(player, planets)
+    first = list(points)
+    for _ in range(5):
+        points, hit = predictor.predict(player, planets)
+    assert points == first
+    assert predictor.full_updates == 1 and predictor.reused == 0
+
+
+def test_reused_path_follows_a_full_prediction(headless):
+    game.game_rng.seed(1)
+    game.reset_game()
+    predictor = game.TrajectoryPredictor(game.PREDICTION_STEPS, game.PREDICTION_DT)
+    for _ in range(600):
+        if game.simulate_tick(game.Controls()):
+            game.reset_game()
+        points, hit = predictor.predict(game.player, game.planets)
+        fresh, fresh_hit = game.predict_trajectory(game.player, game.planets, game.PREDICTION_STEPS,
+                                                   game.PREDICTION_DT)
+        for (x, y), (fresh_x, fresh_y) in zip(points, fresh):
+            assert math.hypot(x - fresh_x, y - fresh_y) < 2.0
+    assert predictor.reused > predictor.full_updates